@@ -0,0 +1,124 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Модуль не импортирует PySide6, поэтому процессы-исполнители
+# запускаются быстро и работают без дисплея
+from clip_area import ClipArea, CLIP_ALGORITHMS
+
+OUTPUT_SUFFIX = ".clipped.txt"  # Окончание имени файла результата
+
+def expand_inputs(patterns):
+    # Раскрытие шаблонов glob; имя без совпадений передаётся как есть,
+    # чтобы ошибка была выведена для конкретного файла. Результаты прошлых
+    # запусков, лежащие рядом с исходными файлами, шаблоном не выбираются
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            files.append(pattern)
+        elif glob.escape(pattern) != pattern:
+            files.extend(m for m in matches if not m.endswith(OUTPUT_SUFFIX))
+        else:
+            files.extend(matches)
+    return list(dict.fromkeys(files))
+
+def output_path(filename, output_dir=None):
+    name = os.path.splitext(os.path.basename(filename))[0] + OUTPUT_SUFFIX
+    return os.path.join(output_dir or os.path.dirname(filename), name)
+
+def write_segments(filename, segments):
+    # Результат записывается в текстовом формате: n, затем n строк x1 y1 x2 y2
+    with open(filename, 'w') as f:
+        f.write(f"{len(segments)}\n")
+        np.savetxt(f, segments, fmt='%.17g')
+
+def clip_file(filename, output, algorithm, parallel=None):
+    start = time.perf_counter()
+    clip_area = ClipArea(algorithm)
+    # В режиме parallel сцена загружается без отсечения и затем
+    # отсекается по частям в parallel процессах
+    for _ in clip_area.load_iter(filename, clip=not parallel):
+        pass
+    if parallel:
+        clip_area.clip_parallel(parallel)
+    loaded = time.perf_counter()
+
+    write_segments(output, clip_area.clipped_segments)
+    written = time.perf_counter()
+
+    return {
+        "input": filename,
+        "output": output,
+        "segments": len(clip_area.segments),
+        "clipped": len(clip_area.clipped_segments),
+        "load": loaded - start,
+        "write": written - loaded,
+    }
+
+def run_file(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+def report(filename, result):
+    if isinstance(result, Exception):
+        print(f"{filename}: ошибка: {result}", file=sys.stderr)
+        return False
+    print(f"{filename}: отрезков {result['segments']}, видимых {result['clipped']}, "
+          f"загрузка и отсечение {result['load']:.3f} с, "
+          f"запись {result['write']:.3f} с -> {result['output']}")
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Пакетное отсечение отрезков без графического интерфейса"
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="файлы сцен (.txt или .clip) или шаблоны glob")
+    parser.add_argument("-o", "--output-dir",
+                        help="каталог для результатов (по умолчанию рядом с исходным файлом)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="число процессов")
+    parser.add_argument("-a", "--algorithm", choices=list(CLIP_ALGORITHMS),
+                        default="cohen_sutherland", help="алгоритм отсечения")
+    parser.add_argument("-p", "--parallel", type=int, metavar="N",
+                        help="отсекать каждую сцену по частям в N процессах; "
+                             "файлы при этом обрабатываются по очереди")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    start = time.perf_counter()
+    if args.parallel:
+        # Одна большая сцена уже занимает все ядра, пул по файлам не нужен
+        results = (run_file(clip_file, filename, output_path(filename, args.output_dir),
+                            args.algorithm, args.parallel)
+                   for filename in files)
+        for filename, result in zip(files, results):
+            failed += not report(filename, result)
+    else:
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {
+                pool.submit(clip_file, filename, output_path(filename, args.output_dir),
+                            args.algorithm): filename
+                for filename in files
+            }
+            for future in as_completed(futures):
+                failed += not report(futures[future], run_file(future.result))
+
+    print(f"Обработано файлов: {len(files) - failed} из {len(files)} "
+          f"за {time.perf_counter() - start:.3f} с")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from clip_area import ClipArea
+
+BENCH_WINDOW = [-500.0, -500.0, 500.0, 500.0]  # Окно отсечения всех сцен
+BENCH_SIZES = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+BENCH_CHUNK = 1 << 20  # Число отрезков, генерируемых и записываемых за раз
+PAINT_SIZE = (1000, 700)  # Размер изображения для отрисовки
+PAINT_LIMIT = 10 ** 6  # Наибольшее число отрезков, для которого замеряется отрисовка
+
+def uniform_segments(rng, n):
+    # Равномерно распределённые отрезки; часть внутри окна, часть снаружи
+    return rng.uniform(-1000, 1000, (n, 4))
+
+def inside_segments(rng, n):
+    xmin, ymin, xmax, ymax = BENCH_WINDOW
+    points = rng.uniform(0, 1, (n, 4))
+    points[:, 0::2] = xmin + points[:, 0::2] * (xmax - xmin)
+    points[:, 1::2] = ymin + points[:, 1::2] * (ymax - ymin)
+    return points
+
+def outside_segments(rng, n):
+    # Отрезки справа от окна: отбрасываются уже по кодам областей
+    points = rng.uniform(0, 1, (n, 4))
+    points[:, 0::2] = BENCH_WINDOW[2] + 10 + points[:, 0::2] * 500
+    points[:, 1::2] = -1000 + points[:, 1::2] * 2000
+    return points
+
+def corner_segments(rng, n):
+    # Отрезки пересекают окно около его углов, каждый - две стороны окна,
+    # поэтому требуют наибольшего числа итераций отсечения
+    xmin, ymin, xmax, ymax = BENCH_WINDOW
+    corners = np.array([[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]])
+    corner = corners[rng.integers(0, 4, n)]
+    # Направление от центра окна к углу и перпендикуляр к нему
+    outward = np.sign(corner)
+    across = np.column_stack((-outward[:, 1], outward[:, 0]))
+    shift = rng.uniform(-50, 50, (n, 1))
+    length = rng.uniform(100, 200, (n, 1))
+    middle = corner - outward * rng.uniform(5, 40, (n, 1)) + across * shift * 0.1
+    return np.hstack((middle - across * length, middle + across * length))
+
+SCENES = {
+    "uniform": uniform_segments,
+    "inside": inside_segments,
+    "outside": outside_segments,
+    "corners": corner_segments,
+}
+
+def write_scene(filename, scene, n, seed=0):
+    # Сцена записывается в текстовом формате порциями, чтобы не держать
+    # в памяти весь текст для больших n
+    rng = np.random.default_rng(seed)
+    with open(filename, 'w') as f:
+        f.write(f"{n}\n")
+        for start in range(0, n, BENCH_CHUNK):
+            np.savetxt(f, SCENES[scene](rng, min(BENCH_CHUNK, n - start)), fmt='%.6f')
+        f.write(" ".join(str(v) for v in BENCH_WINDOW) + "\n")
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def make_painter():
+    # PySide6 импортируется только при замере отрисовки
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtGui import QImage
+    from main import GraphicsWidget
+
+    app = QApplication.instance() or QApplication([])
+    widget = GraphicsWidget()
+    widget.resize(*PAINT_SIZE)
+
+    def paint(clip_area):
+        widget.clip_area = clip_area
+        widget.auto_scale()
+        image = QImage(widget.size(), QImage.Format_ARGB32)
+        widget.render(image)
+        app.processEvents()
+    return paint
+
+def run_scene(filename, repeat, paint=None):
+    results = {}
+    clip_area = ClipArea()
+    results["load_from_file"] = measure(lambda: clip_area.load_from_file(filename), repeat)
+    results["cohen_sutherland_clip"] = measure(clip_area.cohen_sutherland_clip, repeat)
+    if paint is not None:
+        results["paint"] = measure(lambda: paint(clip_area), repeat)
+    return results, len(clip_area.segments), len(clip_area.clipped_segments)
+
+def summary(times):
+    return {"times": times, "min": min(times), "median": statistics.median(times)}
+
+def compare(results, baseline, threshold):
+    # Сравнение с предыдущим запуском по наименьшему времени, оно меньше
+    # всего зависит от случайных задержек; возвращает число замедлений
+    old = {(r["scene"], r["n"], r["stage"]): r["min"] for r in baseline["results"]}
+    slower = 0
+    for r in results:
+        key = (r["scene"], r["n"], r["stage"])
+        if key not in old or old[key] <= 0:
+            continue
+        ratio = r["min"] / old[key]
+        mark = ""
+        if ratio > threshold:
+            slower += 1
+            mark = "  <-- замедление"
+        print(f"{r['scene']:>8} {r['n']:>9} {r['stage']:<22} {old[key]:9.4f} -> "
+              f"{r['min']:9.4f} с  x{ratio:.2f}{mark}")
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Замер производительности загрузки, отсечения и отрисовки"
+    )
+    parser.add_argument("-n", "--sizes", type=lambda s: [int(float(v)) for v in s.split(",")],
+                        default=BENCH_SIZES, help="числа отрезков через запятую, например 1e3,1e5")
+    parser.add_argument("-s", "--scenes", nargs="+", choices=list(SCENES),
+                        default=list(SCENES), help="типы сцен")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="число повторов замера")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="файл результатов JSON")
+    parser.add_argument("--no-paint", action="store_true",
+                        help="не замерять отрисовку (без PySide6)")
+    parser.add_argument("--paint-limit", type=lambda s: int(float(s)), default=PAINT_LIMIT,
+                        help="не замерять отрисовку сцен с большим числом отрезков")
+    parser.add_argument("--data-dir", help="каталог для файлов сцен (по умолчанию временный)")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="сравнить с результатами предыдущего запуска")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="допустимое отношение времён при сравнении")
+    args = parser.parse_args(argv)
+
+    paint = None if args.no_paint else make_painter()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for scene in args.scenes:
+            for n in args.sizes:
+                filename = os.path.join(data_dir, f"{scene}_{n}.txt")
+                if not os.path.exists(filename):
+                    write_scene(filename, scene, n)
+                times, segments, clipped = run_scene(
+                    filename, args.repeat, paint if n <= args.paint_limit else None)
+                for stage, stage_times in times.items():
+                    results.append({"scene": scene, "n": n, "stage": stage,
+                                    "segments": segments, "clipped": clipped,
+                                    **summary(stage_times)})
+                    print(f"{scene:>8} {n:>9} {stage:<22} {min(stage_times):9.4f} с")
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Результаты записаны в {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.threshold)
+        return 1 if slower else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,983 @@
+import os
+import struct
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from perf import perf
+from polygon_clip import (polygon_area, is_convex_polygon, empty_primitives,
+                          primitives_from_lists, clip_general_batch, clip_polylines,
+                          sutherland_hodgman_batch, weiler_atherton_batch)
+
+def compute_outcodes(x, y, clip_rect):
+    # Векторное вычисление кодов областей для массивов координат
+    # сдвигом масок, без выборок по маскам
+    xmin, ymin, xmax, ymax = clip_rect
+    left = x < xmin
+    bottom = y < ymin
+    codes = left.view(np.uint8) | ((~left & (x > xmax)).view(np.uint8) << 1)
+    codes |= bottom.view(np.uint8) << 2
+    codes |= (~bottom & (y > ymax)).view(np.uint8) << 3
+    return codes
+
+def cohen_sutherland_batch(segments, clip_rect, return_index=False):
+    # Пакетный алгоритм Коэна-Сазерленда для массива отрезков (N, 4).
+    # На каждой итерации обрабатываются только ещё не решённые отрезки;
+    # точки пересечения вычисляются для всех сразу через np.where,
+    # без присваиваний по маскам границ
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    xmin, ymin, xmax, ymax = clip_rect
+
+    result = segments.copy()
+    accepted = np.zeros(len(segments), dtype=bool)
+
+    idx = np.arange(len(segments))
+    x1, y1, x2, y2 = (segments[:, i].copy() for i in range(4))
+    outcode1 = compute_outcodes(x1, y1, clip_rect)
+    outcode2 = compute_outcodes(x2, y2, clip_rect)
+
+    while len(idx):
+        # Полностью видимые отрезки
+        inside = (outcode1 | outcode2) == 0
+        if inside.any():
+            accepted[idx[inside]] = True
+            result[idx[inside]] = np.column_stack(
+                (x1[inside], y1[inside], x2[inside], y2[inside])
+            )
+
+        # Оставляем только отрезки, требующие отсечения
+        active = ~inside & ((outcode1 & outcode2) == 0)
+        if not active.all():
+            idx = idx[active]
+            x1, y1, x2, y2 = x1[active], y1[active], x2[active], y2[active]
+            outcode1, outcode2 = outcode1[active], outcode2[active]
+        if not len(idx):
+            break
+
+        first = outcode1 != 0
+        outcode_out = np.where(first, outcode1, outcode2)
+        dx = x2 - x1
+        dy = y2 - y1
+
+        # Приоритет границ как в скалярной версии: лево, право, низ, верх
+        vertical = (outcode_out & 3) != 0
+        bound_x = np.where((outcode_out & 1) != 0, xmin, xmax)
+        bound_y = np.where((outcode_out & 4) != 0, ymin, ymax)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = np.where(vertical, bound_x,
+                         np.where(dy != 0, x1 + dx * (bound_y - y1) / dy, x1))
+            y = np.where(vertical,
+                         np.where(dx != 0, y1 + dy * (bound_x - x1) / dx, y1), bound_y)
+
+        second = ~first
+        x1 = np.where(first, x, x1)
+        y1 = np.where(first, y, y1)
+        x2 = np.where(second, x, x2)
+        y2 = np.where(second, y, y2)
+        outcode1 = np.where(first, compute_outcodes(x1, y1, clip_rect), outcode1)
+        outcode2 = np.where(second, compute_outcodes(x2, y2, clip_rect), outcode2)
+
+    if return_index:
+        return result[accepted], np.flatnonzero(accepted)
+    return result[accepted]
+
+def liang_barsky_batch(segments, clip_rect, return_index=False):
+    # Параметрический алгоритм Лианга-Барски: для каждой границы окна
+    # сразу уточняются параметры входа t0 и выхода t1 всех отрезков
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    xmin, ymin, xmax, ymax = clip_rect
+    x1, y1, x2, y2 = segments.T
+    dx = x2 - x1
+    dy = y2 - y1
+
+    t0 = np.zeros(len(segments))
+    t1 = np.ones(len(segments))
+    visible = np.ones(len(segments), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x1 - xmin), (dx, xmax - x1),
+                     (-dy, y1 - ymin), (dy, ymax - y1)):
+            # Отрезок параллелен границе и лежит снаружи
+            visible &= ~((p == 0) & (q < 0))
+            r = q / p
+            entering = p < 0
+            leaving = p > 0
+            t0 = np.where(entering, np.maximum(t0, r), t0)
+            t1 = np.where(leaving, np.minimum(t1, r), t1)
+
+    visible &= t0 <= t1
+    t0, t1 = t0[visible], t1[visible]
+    x1, y1, dx, dy = x1[visible], y1[visible], dx[visible], dy[visible]
+    result = np.column_stack((x1 + t0 * dx, y1 + t0 * dy,
+                              x1 + t1 * dx, y1 + t1 * dy))
+    if return_index:
+        return result, np.flatnonzero(visible)
+    return result
+
+def cyrus_beck_batch(segments, clip_polygon, return_index=False):
+    # Алгоритм Кируса-Бека для выпуклого окна, заданного вершинами (K, 2).
+    # Цикл идёт по рёбрам окна, все отрезки обрабатываются одновременно
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    polygon = np.asarray(clip_polygon, dtype=np.float64)
+    x1, y1, x2, y2 = segments.T
+    dx = x2 - x1
+    dy = y2 - y1
+
+    # Внутренние нормали зависят от направления обхода окна
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    orientation = 1.0 if polygon_area(polygon) > 0 else -1.0
+    normals = orientation * np.column_stack((-edges[:, 1], edges[:, 0]))
+
+    t0 = np.zeros(len(segments))
+    t1 = np.ones(len(segments))
+    visible = np.ones(len(segments), dtype=bool)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for (px, py), (nx, ny) in zip(polygon, normals):
+            num = nx * (x1 - px) + ny * (y1 - py)
+            den = nx * dx + ny * dy
+            visible &= ~((den == 0) & (num < 0))
+            r = -num / den
+            t0 = np.where(den > 0, np.maximum(t0, r), t0)
+            t1 = np.where(den < 0, np.minimum(t1, r), t1)
+
+    visible &= t0 <= t1
+    t0, t1 = t0[visible], t1[visible]
+    x1, y1, dx, dy = x1[visible], y1[visible], dx[visible], dy[visible]
+    result = np.column_stack((x1 + t0 * dx, y1 + t0 * dy,
+                              x1 + t1 * dx, y1 + t1 * dy))
+    if return_index:
+        return result, np.flatnonzero(visible)
+    return result
+
+def rect_to_polygon(clip_rect):
+    xmin, ymin, xmax, ymax = clip_rect
+    return np.array([[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]],
+                    dtype=np.float64)
+
+# Доступные алгоритмы отсечения: имя -> (название, функция, только прямоугольное окно)
+CLIP_ALGORITHMS = {
+    "cohen_sutherland": ("Коэн-Сазерленд", cohen_sutherland_batch, True),
+    "liang_barsky": ("Лианг-Барски", liang_barsky_batch, True),
+    "cyrus_beck": ("Кирус-Бек", cyrus_beck_batch, False),
+}
+
+CHUNK_SIZE = 1 << 16  # Число строк файла, разбираемых за один раз
+
+def parse_segment_lines(lines):
+    # Разбор порции строк "x1 y1 x2 y2" в массив (N, 4)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return np.loadtxt(lines, dtype=np.float64, ndmin=2,
+                              usecols=(0, 1, 2, 3), comments=None).reshape(-1, 4)
+    except ValueError:
+        # В порции есть неполные строки: разбираем построчно и пропускаем их
+        segments = []
+        for line in lines:
+            coords = list(map(float, line.split()))
+            if len(coords) >= 4:
+                segments.append(coords[:4])
+        return np.array(segments, dtype=np.float64).reshape(-1, 4)
+
+POLYLINE_KEYWORD = "polyline"  # Строка ломаной: polyline x1 y1 ... xk yk
+POLYGON_KEYWORD = "polygon"  # Строка многоугольника: polygon x1 y1 ... xk yk
+
+def parse_tail_lines(lines):
+    # Строки после отрезков: ломаные и многоугольники (по ключевому слову
+    # в начале строки), затем окно отсечения
+    polylines = []
+    polygons = []
+    window = []
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] in (POLYLINE_KEYWORD, POLYGON_KEYWORD):
+            vertices = np.array(parts[1:], dtype=np.float64)
+            if len(vertices) % 2:
+                raise ValueError(f"нечётное число координат в строке {parts[0]}")
+            target = polylines if parts[0] == POLYLINE_KEYWORD else polygons
+            target.append(vertices.reshape(-1, 2))
+        else:
+            window = list(map(float, parts))
+            break
+    return primitives_from_lists(polylines), primitives_from_lists(polygons), window
+
+def read_last_line(filename, block_size=4096):
+    # Чтение последней непустой строки без чтения всего файла
+    with open(filename, 'rb') as f:
+        f.seek(0, 2)
+        position = f.tell()
+        data = b''
+        while position > 0:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            lines = data.splitlines()
+            if len(lines) > 1 and any(line.strip() for line in lines[1:]):
+                break
+        for line in reversed(data.splitlines()):
+            if line.strip():
+                return line.decode()
+        return ''
+
+def read_window_line(filename):
+    # Координаты из последней строки текстового файла - предполагаемое окно,
+    # или None, если строка задаёт ломаную или многоугольник
+    parts = read_last_line(filename).split()
+    if not parts or parts[0] in (POLYLINE_KEYWORD, POLYGON_KEYWORD):
+        return None
+    try:
+        return list(map(float, parts))
+    except ValueError:
+        return None
+
+# Двоичный формат сцены: заголовок, окно отсечения и плотный блок отрезков.
+# Заголовок: сигнатура, версия, размер числа (4 или 8 байт), число отрезков,
+# число координат окна (0, 4 для прямоугольника или 2k для многоугольника)
+BINARY_MAGIC = b'CLIPSEG\0'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<8sIIQII')
+BINARY_ALIGN = 64
+
+def is_binary_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+def write_binary_header(f, count, window, dtype):
+    window = np.asarray(window if window is not None else [], dtype='<f8')
+    f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION,
+                               np.dtype(dtype).itemsize, count, len(window), 0))
+    f.write(window.tobytes())
+    # Блок отрезков выравнивается для быстрого отображения в память
+    padding = -f.tell() % BINARY_ALIGN
+    f.write(b'\0' * padding)
+
+def open_binary(filename):
+    # Открывает двоичную сцену без копирования: отрезки отображаются
+    # в память через np.memmap. Возвращает (отрезки, координаты окна)
+    with open(filename, 'rb') as f:
+        header = f.read(BINARY_HEADER.size)
+        magic, version, itemsize, count, window_len, _ = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError("неподдерживаемый формат двоичного файла")
+        window = np.frombuffer(f.read(8 * window_len), dtype='<f8').tolist()
+        offset = f.tell() + (-f.tell() % BINARY_ALIGN)
+    
+    dtype = {4: '<f4', 8: '<f8'}[itemsize]
+    if count == 0:
+        return np.empty((0, 4), dtype=dtype), window
+    segments = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count, 4))
+    return segments, window
+
+def convert_text_to_binary(text_filename, binary_filename, dtype=np.float64,
+                           chunk_size=CHUNK_SIZE):
+    # Преобразование текстового файла сцены в двоичный формат.
+    # Первый проход только пропускает строки отрезков, чтобы найти окно
+    # для заголовка, второй разбирает и записывает отрезки порциями
+    with open(text_filename, 'r') as f:
+        n = int(f.readline().strip())
+        for _ in islice(f, n):
+            pass
+        # Ломаные и многоугольники в двоичный формат не переносятся
+        _, _, window = parse_tail_lines(f)
+    if len(window) < 4:
+        window = []
+    
+    dtype = np.dtype(dtype).newbyteorder('<')
+    with open(text_filename, 'r') as src, open(binary_filename, 'wb') as dst:
+        src.readline()
+        write_binary_header(dst, n, window, dtype)
+        data_offset = dst.tell()
+        count = 0
+        read = 0
+        while read < n:
+            lines = list(islice(src, min(chunk_size, n - read)))
+            if not lines:
+                raise ValueError(f"ожидалось {n} отрезков, прочитано {read}")
+            read += len(lines)
+            chunk = parse_segment_lines(lines)
+            dst.write(chunk.astype(dtype).tobytes())
+            count += len(chunk)
+        
+        # Неполные строки пропускаются, поэтому уточняем число отрезков
+        if count != n:
+            dst.seek(0)
+            write_binary_header(dst, count, window, dtype)
+            dst.seek(data_offset + count * 4 * dtype.itemsize)
+            dst.truncate()
+    return count
+
+GRID_SEGMENTS_PER_CELL = 16  # Среднее число отрезков в корзине сетки
+GRID_MAX_CELLS = 1024  # Максимальное число корзин по одной оси
+
+# Положение корзины сетки относительно окна отсечения
+DELTA_MAX_SHARE = 0.5  # Доля отрезков у смещённых сторон, выше которой окно отсекается заново целиком
+CELL_OUTSIDE = 0
+CELL_INSIDE = 1
+CELL_PARTIAL = 2
+
+def points_in_convex_polygon(x, y, polygon):
+    # Проверка принадлежности точек выпуклому многоугольнику (с границей)
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    orientation = 1.0 if polygon_area(polygon) > 0 else -1.0
+    inside = np.ones(np.shape(x), dtype=bool)
+    for (px, py), (ex, ey) in zip(polygon, edges):
+        inside &= orientation * (ex * (y - py) - ey * (x - px)) >= 0
+    return inside
+
+def rect_difference(a, b):
+    # Части прямоугольника a = [xmin, ymin, xmax, ymax] вне прямоугольника b:
+    # не более четырёх прямоугольников
+    ax0, ay0, ax1, ay1 = a
+    bx0, by0, bx1, by1 = b
+    if bx0 > ax1 or bx1 < ax0 or by0 > ay1 or by1 < ay0:
+        return [list(a)]
+    parts = []
+    if ax0 < bx0:
+        parts.append([ax0, ay0, bx0, ay1])
+    if bx1 < ax1:
+        parts.append([bx1, ay0, ax1, ay1])
+    x0, x1 = max(ax0, bx0), min(ax1, bx1)
+    if ay0 < by0:
+        parts.append([x0, ay0, x1, by0])
+    if by1 < ay1:
+        parts.append([x0, by1, x1, ay1])
+    return parts
+
+def swept_corners(old, new):
+    # Вершины (K, 4, 2) четырёхугольников, которые заметают стороны
+    # многоугольного окна при переходе от вершин old к вершинам new (K, 2).
+    # Точка, попавшая в окно или вышедшая из него, лежит в выпуклой оболочке
+    # одного из них
+    return np.stack((old, np.roll(old, -1, axis=0), new, np.roll(new, -1, axis=0)), axis=1)
+
+def swept_regions(old, new):
+    # Габариты областей (K, 4), заметаемых сторонами окна
+    corners = swept_corners(old, new)
+    return np.column_stack((corners.min(axis=1), corners.max(axis=1)))
+
+def convex_hull(points):
+    # Выпуклая оболочка нескольких точек (алгоритм Эндрю), обход против часовой стрелки
+    points = sorted(map(tuple, points))
+    hull = []
+    for chain in (points, points[::-1]):
+        start = len(hull)
+        for p in chain:
+            while len(hull) >= start + 2 and \
+                    (hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1]) - \
+                    (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0]) <= 0:
+                hull.pop()
+            hull.append(p)
+        hull.pop()
+    return np.array(hull)
+
+class SegmentGrid:
+    # Равномерная сетка корзин над ограничивающими прямоугольниками отрезков.
+    # Каждый отрезок попадает ровно в одну корзину по центру своего
+    # прямоугольника, а для корзины хранится объединение прямоугольников
+    # её отрезков. Отрезки упорядочены по корзинам (как в формате CSR).
+    # Отрезки читаются порциями и не копируются: для отображённого в память
+    # файла сетка хранит только номера отрезков
+    def __init__(self, segments, per_cell=GRID_SEGMENTS_PER_CELL, chunk_size=CHUNK_SIZE):
+        n = len(segments)
+        self.cells = int(np.clip(np.ceil(np.sqrt(n / per_cell)), 1, GRID_MAX_CELLS))
+        self.order = np.empty(0, dtype=np.int64)
+        self.cell_start = np.empty(0, dtype=np.int64)
+        self.cell_end = np.empty(0, dtype=np.int64)
+        self.cell_bounds = np.empty((0, 4))
+        if not n:
+            return
+        
+        x0, y0, x1, y1 = segment_bounds(segments)
+        cell_w = max(x1 - x0, 1e-12) / self.cells
+        cell_h = max(y1 - y0, 1e-12) / self.cells
+        cell_id = np.empty(n, dtype=np.int32)
+        bounds = np.empty((4, self.cells * self.cells))
+        bounds[:2] = np.inf
+        bounds[2:] = -np.inf
+        for start in range(0, n, chunk_size):
+            chunk = np.asarray(segments[start:start + chunk_size], dtype=np.float64)
+            xmin = np.minimum(chunk[:, 0], chunk[:, 2])
+            xmax = np.maximum(chunk[:, 0], chunk[:, 2])
+            ymin = np.minimum(chunk[:, 1], chunk[:, 3])
+            ymax = np.maximum(chunk[:, 1], chunk[:, 3])
+            ix = np.clip(((xmin + xmax) / 2 - x0) // cell_w, 0, self.cells - 1)
+            iy = np.clip(((ymin + ymax) / 2 - y0) // cell_h, 0, self.cells - 1)
+            ids = (iy * self.cells + ix).astype(np.int32)
+            cell_id[start:start + len(chunk)] = ids
+            np.minimum.at(bounds[0], ids, xmin)
+            np.minimum.at(bounds[1], ids, ymin)
+            np.maximum.at(bounds[2], ids, xmax)
+            np.maximum.at(bounds[3], ids, ymax)
+        
+        self.order = np.argsort(cell_id, kind='stable')
+        sorted_ids = cell_id[self.order]
+        
+        # Непустые корзины: начало и конец их диапазонов в self.order
+        self.cell_start = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        self.cell_end = np.r_[self.cell_start[1:], n]
+        self.cell_bounds = bounds[:, sorted_ids[self.cell_start]].T.copy()
+    
+    def classify(self, clip_rect, clip_polygon=None):
+        # Положение каждой непустой корзины относительно окна:
+        # CELL_OUTSIDE, CELL_INSIDE или CELL_PARTIAL (пересекает границу)
+        xmin, ymin, xmax, ymax = clip_rect
+        bxmin, bymin, bxmax, bymax = self.cell_bounds.T
+        overlap = (bxmax >= xmin) & (bxmin <= xmax) & (bymax >= ymin) & (bymin <= ymax)
+        
+        if clip_polygon is None:
+            inside = (bxmin >= xmin) & (bxmax <= xmax) & (bymin >= ymin) & (bymax <= ymax)
+        else:
+            inside = overlap.copy()
+            for cx, cy in ((bxmin, bymin), (bxmax, bymin), (bxmax, bymax), (bxmin, bymax)):
+                inside &= points_in_convex_polygon(cx, cy, clip_polygon)
+        
+        state = np.full(len(self.cell_bounds), CELL_OUTSIDE, dtype=np.int8)
+        state[overlap] = CELL_PARTIAL
+        state[inside] = CELL_INSIDE
+        return state
+    
+    def overlapping(self, regions):
+        # Маска корзин, прямоугольник которых пересекает хотя бы одну
+        # из областей regions (R, 4)
+        bxmin, bymin, bxmax, bymax = self.cell_bounds.T
+        mask = np.zeros(len(self.cell_bounds), dtype=bool)
+        for xmin, ymin, xmax, ymax in regions:
+            mask |= (bxmax >= xmin) & (bxmin <= xmax) & (bymax >= ymin) & (bymin <= ymax)
+        return mask
+    
+    def gather(self, cell_mask):
+        # Объединение диапазонов выбранных корзин без цикла на Python
+        starts = self.cell_start[cell_mask]
+        lengths = self.cell_end[cell_mask] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        shift = starts - (np.cumsum(lengths) - lengths)
+        return self.order[np.repeat(shift, lengths) + np.arange(total)]
+
+def segment_bounds(segments):
+    # Габариты массива отрезков [xmin, ymin, xmax, ymax] или None для пустого
+    if not len(segments):
+        return None
+    xs = segments[:, 0::2]
+    ys = segments[:, 1::2]
+    return [float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())]
+
+def merge_bounds(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+
+def segments_in_rect(segments, rect):
+    # Маска отрезков, ограничивающий прямоугольник которых пересекает rect
+    xmin, ymin, xmax, ymax = rect
+    x1, y1, x2, y2 = np.asarray(segments).reshape(-1, 4).T
+    return ((np.maximum(x1, x2) >= xmin) & (np.minimum(x1, x2) <= xmax) &
+            (np.maximum(y1, y2) >= ymin) & (np.minimum(y1, y2) <= ymax))
+
+SHARDS_PER_WORKER = 4  # Число частей на процесс для выравнивания нагрузки
+
+def attach_shared(name, shape, dtype):
+    # Подключение к блоку общей памяти, созданному главным процессом;
+    # удаляет блок только создатель
+    shm = SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def clip_shard(names, n, start, stop, clip_func, window):
+    # Выполняется в процессе-исполнителе: часть отрезков читается из общей
+    # памяти, результат пишется в строки с теми же номерами
+    segments_name, result_name, visible_name = names
+    blocks = []
+    try:
+        shm, segments = attach_shared(segments_name, (n, 4), np.float64)
+        blocks.append(shm)
+        shm, result = attach_shared(result_name, (n, 4), np.float64)
+        blocks.append(shm)
+        shm, visible = attach_shared(visible_name, (n,), np.bool_)
+        blocks.append(shm)
+        
+        clipped, accepted = clip_func(segments[start:stop], window, True)
+        result[start + accepted] = clipped
+        visible[start + accepted] = True
+        # Массивы ссылаются на буферы блоков и должны быть удалены до close()
+        del segments, result, visible
+    finally:
+        for shm in blocks:
+            shm.close()
+    return stop - start
+
+def clip_parallel(segments, clip_func, window, workers=None, shards=None):
+    # Отсечение массива отрезков по частям в нескольких процессах.
+    # Отрезки, результат и маска видимости лежат в общей памяти, между
+    # процессами передаются только имена блоков и границы частей
+    n = len(segments)
+    if n == 0:
+        return np.empty((0, 4))
+    workers = workers or os.cpu_count()
+    shards = min(n, shards or workers * SHARDS_PER_WORKER)
+    
+    blocks = [SharedMemory(create=True, size=n * 32),
+              SharedMemory(create=True, size=n * 32),
+              SharedMemory(create=True, size=n)]
+    try:
+        shared = np.ndarray((n, 4), dtype=np.float64, buffer=blocks[0].buf)
+        shared[:] = segments
+        result = np.ndarray((n, 4), dtype=np.float64, buffer=blocks[1].buf)
+        visible = np.ndarray((n,), dtype=np.bool_, buffer=blocks[2].buf)
+        visible[:] = False
+        
+        names = tuple(shm.name for shm in blocks)
+        bounds = np.linspace(0, n, shards + 1).astype(np.int64)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(clip_shard, names, n, int(start), int(stop),
+                                   clip_func, window)
+                       for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+            for future in futures:
+                future.result()
+        
+        # Маска сохраняет исходный порядок отрезков независимо от того,
+        # в каком порядке завершились части
+        clipped = result[visible]
+        del shared, result, visible
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+    return clipped
+
+class ClipArea:
+    def __init__(self, algorithm="cohen_sutherland"):
+        self.algorithm = algorithm
+        self.version = 0  # Число изменений отрезков и результата отсечения
+        self.reset()
+    
+    def reset(self):
+        self.clip_rect = None
+        self.clip_polygon = None
+        self.window_convex = True
+        self.segments = np.empty((0, 4))
+        self.clipped_segments = np.empty((0, 4))
+        self.clipped_parts = []
+        # Ломаные и многоугольники: пары (вершины, смещения)
+        self.polylines = empty_primitives()
+        self.polygons = empty_primitives()
+        self.clipped_polylines = empty_primitives()
+        self.clipped_polygons = empty_primitives()
+        self.bounds = None
+        self.grid = None
+        self.invalidate_cache()
+    
+    def invalidate_cache(self):
+        # Кэш результатов отсечения по каждому отрезку и окно, для которого
+        # этот кэш был вычислен. Ещё не собранный результат собирается
+        # до сброса кэша
+        if self.clipped_result is None:
+            self.clipped_result = self.clip_cache[self.clip_visible]
+        self.clip_cache = None
+        self.clip_visible = None
+        # Для невыпуклого окна: части отрезков и номера их исходных отрезков
+        self.clip_pieces = None
+        self.clip_source = None
+        self.clip_window = None
+    
+    @property
+    def clipped_segments(self):
+        # После отсечения через сетку результат хранится в кэше по номерам
+        # отрезков и собирается в сплошной массив только при обращении
+        if self.clipped_result is None:
+            self.clipped_result = self.clip_cache[self.clip_visible]
+        return self.clipped_result
+    
+    @clipped_segments.setter
+    def clipped_segments(self, segments):
+        self.clipped_result = segments
+        self.version += 1
+    
+    def clipped_in_rect(self, rect):
+        # Отсечённые отрезки, попадающие в rect. Результат сетки берётся
+        # из кэша по маске, без сборки всего массива после каждого отсечения
+        if self.clipped_result is None:
+            cache = self.clip_cache
+            return cache[self.clip_visible & segments_in_rect(cache, rect)]
+        return self.clipped_result[segments_in_rect(self.clipped_result, rect)]
+    
+    @perf.timed("load_from_file")
+    def load_from_file(self, filename, algorithm=None, chunk_size=CHUNK_SIZE):
+        try:
+            for _ in self.load_iter(filename, algorithm, chunk_size):
+                pass
+        except Exception as e:
+            print(f"Ошибка загрузки файла: {e}")
+            return False
+        return True
+    
+    def load_iter(self, filename, algorithm=None, chunk_size=CHUNK_SIZE, clip=True):
+        # Потоковая загрузка: файл читается порциями по chunk_size строк,
+        # каждая порция разбирается сразу в массив и тут же отсекается.
+        # После каждой порции возвращается пара (прочитано, всего).
+        # При clip=False отрезки только загружаются, отсечение вызывается отдельно
+        self.reset()
+        if algorithm is not None:
+            self.algorithm = algorithm
+        
+        if is_binary_file(filename):
+            yield from self.load_binary_iter(filename, chunk_size, clip)
+            return
+        
+        with open(filename, 'r') as f:
+            n = int(f.readline().strip())
+            # Окно записано в конце файла, поэтому порции отсекаются по его
+            # последней строке. Окно ли это или последний отрезок файла без
+            # окна, выясняется только после чтения n отрезков, поэтому до
+            # проверки окно и отсечённые порции сцене не назначаются
+            tail_coords = read_window_line(filename)
+            tail_area = ClipArea(self.algorithm)
+            if tail_coords is not None:
+                try:
+                    tail_area.set_window(tail_coords)
+                except ValueError:
+                    tail_coords = None
+            
+            segments = np.empty((n, 4), dtype=np.float64)
+            self.clipped_parts = []
+            clipped = []
+            count = 0
+            read = 0
+            
+            while read < n:
+                lines = list(islice(f, min(chunk_size, n - read)))
+                if not lines:
+                    raise ValueError(f"ожидалось {n} отрезков, прочитано {read}")
+                read += len(lines)
+                
+                chunk = parse_segment_lines(lines)
+                segments[count:count + len(chunk)] = chunk
+                count += len(chunk)
+                self.bounds = merge_bounds(self.bounds, segment_bounds(chunk))
+                if clip and tail_area.has_window():
+                    clipped.append(tail_area.clip_segments(chunk))
+                yield read, n
+            
+            self.polylines, self.polygons, window_coords = parse_tail_lines(f)
+        
+        self.segments = segments[:count]
+        self.version += 1
+        for vertices, _ in (self.polylines, self.polygons):
+            self.bounds = merge_bounds(self.bounds, segment_bounds(vertices))
+        self.set_window(window_coords)
+        if window_coords != tail_coords:
+            # Последняя строка оказалась не окном: отсекаем заново
+            if clip:
+                self.clip()
+        elif clip and self.has_window():
+            self.clipped_parts = clipped
+            self.clipped_segments = np.concatenate(clipped) if clipped else np.empty((0, 4))
+            self.clip_primitives()
+    
+    def load_binary_iter(self, filename, chunk_size=CHUNK_SIZE, clip=True):
+        # Отрезки двоичного файла не копируются в память, отсекаются порциями
+        segments, window = open_binary(filename)
+        self.segments = segments
+        self.version += 1
+        self.set_window(window)
+        
+        n = len(segments)
+        clipped = self.clipped_parts = []
+        for start in range(0, n, chunk_size):
+            chunk = segments[start:start + chunk_size]
+            self.bounds = merge_bounds(self.bounds, segment_bounds(chunk))
+            if clip and self.has_window():
+                clipped.append(self.clip_segments(chunk))
+            yield min(start + chunk_size, n), n
+        if clip and self.has_window():
+            self.clipped_segments = np.concatenate(clipped) if clipped else np.empty((0, 4))
+    
+    def set_window(self, coords):
+        if len(coords) > 4:
+            # Выпуклое окно задаётся списком вершин x1 y1 ... xk yk
+            self.set_clip_polygon(coords)
+        elif len(coords) == 4:
+            self.clip_rect = coords[:4]
+    
+    def set_clip_polygon(self, coords):
+        polygon = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        if len(polygon) < 3 or polygon_area(polygon) == 0:
+            raise ValueError("окно отсечения должно быть многоугольником ненулевой площади")
+        self.clip_rect = None
+        self.clip_polygon = polygon
+        # Невыпуклое окно отсекается общими алгоритмами без сетки
+        self.window_convex = is_convex_polygon(polygon)
+    
+    def has_window(self):
+        return self.clip_rect is not None or self.clip_polygon is not None
+    
+    def set_clip_rect(self, clip_rect):
+        self.clip_rect = [float(v) for v in clip_rect]
+        self.clip_polygon = None
+        self.clip()
+    
+    def spatial_index(self):
+        # Сетка строится один раз для загруженных отрезков и используется
+        # при каждом повторном отсечении после изменения окна
+        if self.grid is None:
+            self.grid = SegmentGrid(self.segments)
+        return self.grid
+    
+    def data_bounds(self):
+        # Габариты отрезков запоминаются при загрузке, окно добавляется отдельно
+        if self.bounds is None and len(self.segments):
+            self.bounds = segment_bounds(self.segments)
+        bounds = self.bounds
+        if self.has_window():
+            bounds = merge_bounds(bounds, self.window_bounds())
+        return bounds
+    
+    def window_bounds(self):
+        if self.clip_polygon is not None:
+            return [*self.clip_polygon.min(axis=0), *self.clip_polygon.max(axis=0)]
+        return self.clip_rect
+    
+    def set_algorithm(self, algorithm):
+        self.algorithm = algorithm
+        self.invalidate_cache()
+        self.clip()
+    
+    @perf.timed("clip")
+    def clip(self):
+        if not self.has_window():
+            return
+        
+        self.clip_primitives()
+        if not self.window_convex and self.clip_polygon is not None:
+            # Корзины сетки классифицируются только для выпуклого окна
+            self.clip_general()
+            return
+        
+        grid = self.spatial_index()
+        regions = self.window_change() if self.clip_cache is not None else None
+        if regions is None:
+            # Отсекаются только отрезки из корзин на границе окна. Кэш
+            # результата - единственная копия размера сцены в памяти
+            self.clip_pieces = None
+            self.clip_source = None
+            self.clip_cache = np.zeros((len(self.segments), 4))
+            self.clip_visible = np.zeros(len(self.segments), dtype=bool)
+            state = grid.classify(self.window_bounds(), self.clip_polygon)
+            inside = grid.gather(state == CELL_INSIDE)
+            self.clip_cache[inside] = self.segments[inside]
+            self.clip_visible[inside] = True
+            candidates = grid.gather(state == CELL_PARTIAL)
+            segments = self.segments[candidates]
+        else:
+            # Повторно отсекаются только отрезки у смещённых границ окна
+            candidates, segments = self.changed_segments(regions)
+        
+        clipped, accepted = self.clip_segments(segments, return_index=True)
+        self.clip_visible[candidates] = False
+        self.clip_visible[candidates[accepted]] = True
+        self.clip_cache[candidates[accepted]] = clipped
+        self.remember_window()
+        # Сплошной массив результата собирается только при обращении
+        self.clipped_result = None
+        self.version += 1
+    
+    def clip_general(self):
+        # Невыпуклое окно может разбить отрезок на несколько частей, поэтому
+        # результат хранится частями с номерами исходных отрезков; при
+        # перемещении окна заменяются только части отрезков у смещённых сторон
+        regions = self.window_change() if self.clip_source is not None else None
+        if regions is not None:
+            corners = swept_corners(self.clip_window[1], self.clip_polygon)
+            changed = self.changed_segments(regions, corners)
+        if regions is None or changed is None:
+            self.clip_cache = None
+            self.clip_visible = None
+            pieces, source = self.clip_segments(self.segments, return_index=True)
+        else:
+            candidates, segments = changed
+            new_pieces, new_source = self.clip_segments(segments, return_index=True)
+            changed = np.zeros(len(self.segments), dtype=bool)
+            changed[candidates] = True
+            keep = ~changed[self.clip_source]
+            source = np.concatenate((self.clip_source[keep], candidates[new_source]))
+            order = np.argsort(source, kind='stable')
+            pieces = np.concatenate((self.clip_pieces[keep], new_pieces))[order]
+            source = source[order]
+        self.clip_pieces, self.clip_source = pieces, source
+        self.remember_window()
+        self.clipped_segments = pieces
+    
+    def changed_segments(self, regions, corners=None):
+        # Номера (по возрастанию) и координаты отрезков, габариты которых
+        # пересекают области regions; кандидаты берутся из корзин сетки.
+        # С вершинами corners заметённых четырёхугольников отрезки
+        # дополнительно проверяются Кирусом-Беком по их оболочкам, а если
+        # отрезков у смещённых сторон больше доли DELTA_MAX_SHARE сцены,
+        # возвращается None и окно отсекается заново целиком
+        grid = self.spatial_index()
+        candidates = np.sort(grid.gather(grid.overlapping(regions)))
+        segments = np.asarray(self.segments[candidates])
+        x1, y1, x2, y2 = segments.T
+        xmin, xmax = np.minimum(x1, x2), np.maximum(x1, x2)
+        ymin, ymax = np.minimum(y1, y2), np.maximum(y1, y2)
+        masks = [(xmax >= rxmin) & (xmin <= rxmax) & (ymax >= rymin) & (ymin <= rymax)
+                 for rxmin, rymin, rxmax, rymax in regions]
+        near = np.logical_or.reduce(masks)
+        if corners is not None:
+            if np.count_nonzero(near) > DELTA_MAX_SHARE * len(self.segments):
+                return None
+            near[:] = False
+            for mask, quad in zip(masks, corners):
+                index = np.flatnonzero(mask)
+                hull = convex_hull(quad)
+                if len(hull) >= 3 and polygon_area(hull) > 0:
+                    index = index[cyrus_beck_batch(segments[index], hull, True)[1]]
+                near[index] = True
+        return candidates[near], segments[near]
+    
+    def remember_window(self):
+        # Окно, для которого вычислен кэш результата
+        self.clip_window = (None if self.clip_rect is None else list(self.clip_rect),
+                            None if self.clip_polygon is None else self.clip_polygon.copy())
+    
+    def window_change(self):
+        # Области (R, 4), вне которых результат отсечения для прежнего
+        # и нового окна совпадает, или None, если окно сменило вид
+        # и нужно полное отсечение
+        rect, polygon = self.clip_window
+        if polygon is None and self.clip_polygon is None:
+            return np.array(rect_difference(rect, self.clip_rect) +
+                            rect_difference(self.clip_rect, rect)).reshape(-1, 4)
+        if polygon is None or self.clip_polygon is None or \
+                len(polygon) != len(self.clip_polygon):
+            return None
+        if np.array_equal(polygon, self.clip_polygon):
+            return np.empty((0, 4))
+        return swept_regions(polygon, self.clip_polygon)
+    
+    def clip_parallel(self, workers=None, shards=None):
+        # Отсечение всей сцены по частям во всех ядрах, минуя сетку
+        if not self.has_window():
+            return
+        if not self.window_convex and self.clip_polygon is not None:
+            # Невыпуклое окно может разбить отрезок на несколько частей,
+            # результат не укладывается в строки с исходными номерами
+            self.clip()
+            return
+        clip_func, window = self.clip_function()
+        self.clipped_segments = clip_parallel(self.segments, clip_func, window,
+                                              workers, shards)
+        self.clip_primitives()
+    
+    def clip_segments(self, segments, return_index=False):
+        # Отсечение произвольного массива отрезков текущим окном и алгоритмом
+        clip_func, window = self.clip_function()
+        return clip_func(segments, window, return_index)
+    
+    def clip_function(self):
+        _, clip_func, rect_only = CLIP_ALGORITHMS[self.algorithm]
+        if self.clip_polygon is not None and not self.window_convex:
+            return clip_general_batch, self.clip_polygon
+        if self.clip_polygon is not None:
+            # Прямоугольные алгоритмы не работают с произвольным окном
+            if rect_only:
+                clip_func = cyrus_beck_batch
+            window = self.clip_polygon
+        elif rect_only:
+            window = self.clip_rect
+        else:
+            window = rect_to_polygon(self.clip_rect)
+        return clip_func, window
+    
+    def clip_primitives(self):
+        # Ломаные отсекаются по рёбрам с восстановлением связности,
+        # многоугольники - Сазерлендом-Ходжманом для выпуклого окна
+        # и Вейлером-Азертоном для невыпуклого
+        if self.clip_polygon is not None:
+            window = self.clip_polygon
+        else:
+            window = rect_to_polygon(self.clip_rect)
+        convex = self.clip_polygon is None or self.window_convex
+        self.clipped_polylines = clip_polylines(*self.polylines, window, convex)[:2]
+        if convex:
+            self.clipped_polygons = sutherland_hodgman_batch(*self.polygons, window)[:2]
+        else:
+            self.clipped_polygons = weiler_atherton_batch(*self.polygons, window)[:2]
+    
+    @perf.timed("cohen_sutherland_clip")
+    def cohen_sutherland_clip(self):
+        if not self.clip_rect:
+            return
+        
+        self.clipped_segments = cohen_sutherland_batch(self.segments, self.clip_rect)
+    
+    def cohen_sutherland_clip_scalar(self):
+        # Эталонная поотрезковая реализация, используется для проверки
+        # пакетной версии. Возвращает список отсечённых отрезков
+        if not self.clip_rect:
+            return []
+        
+        xmin, ymin, xmax, ymax = self.clip_rect
+        clipped_segments = []
+        
+        for segment in self.segments:
+            x1, y1, x2, y2 = (float(v) for v in segment)
+            outcode1 = self.compute_outcode(x1, y1)
+            outcode2 = self.compute_outcode(x2, y2)
+            accept = False
+            
+            while True:
+                if not (outcode1 | outcode2):
+                    accept = True
+                    break
+                elif outcode1 & outcode2:
+                    break
+                else:
+                    outcode_out = outcode1 if outcode1 else outcode2
+                    
+                    if outcode_out & 1:
+                        x = xmin
+                        y = y1 + (y2 - y1) * (xmin - x1) / (x2 - x1) if x2 != x1 else y1
+                    elif outcode_out & 2:
+                        x = xmax
+                        y = y1 + (y2 - y1) * (xmax - x1) / (x2 - x1) if x2 != x1 else y1
+                    elif outcode_out & 4:
+                        y = ymin
+                        x = x1 + (x2 - x1) * (ymin - y1) / (y2 - y1) if y2 != y1 else x1
+                    elif outcode_out & 8:
+                        y = ymax
+                        x = x1 + (x2 - x1) * (ymax - y1) / (y2 - y1) if y2 != y1 else x1
+                    
+                    if outcode_out == outcode1:
+                        x1, y1 = x, y
+                        outcode1 = self.compute_outcode(x1, y1)
+                    else:
+                        x2, y2 = x, y
+                        outcode2 = self.compute_outcode(x2, y2)
+            
+            if accept:
+                clipped_segments.append([x1, y1, x2, y2])
+        
+        return clipped_segments
+    
+    def compute_outcode(self, x, y):
+        if not self.clip_rect:
+            return 0
+        
+        xmin, ymin, xmax, ymax = self.clip_rect
+        code = 0
+        if x < xmin:
+            code |= 1
+        elif x > xmax:
+            code |= 2
+        if y < ymin:
+            code |= 4
+        elif y > ymax:
+            code |= 8
+        return code
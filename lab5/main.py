@@ -1,104 +1,94 @@
 import sys
+import threading
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, 
-    QHBoxLayout, QPushButton, QFileDialog, QLabel, QMessageBox
+    QHBoxLayout, QPushButton, QFileDialog, QLabel, QMessageBox, QComboBox,
+    QCheckBox, QProgressBar
 )
-from PySide6.QtCore import Qt, QPointF
-from PySide6.QtGui import QPainter, QPen, QColor, QFont
+from PySide6.QtCore import Qt, QPointF, QLineF, QObject, QRunnable, QThreadPool, Signal
+from PySide6.QtGui import QPainter, QPen, QColor, QFont, QImage, QPixmap, QTransform
+import shiboken6
 import math
+from functools import lru_cache
+import numpy as np
 
-class ClipArea:
-    def __init__(self):
-        self.reset()
+from clip_area import (
+    ClipArea, CLIP_ALGORITHMS, CELL_INSIDE, CELL_PARTIAL, segments_in_rect
+)
+from polygon_clip import points_in_polygon, primitive_edges
+from perf import perf
+
+def draw_line_array(painter, lines):
+    # Массив отрезков (N, 4) передаётся в drawLines как QLineF* без копирования
+    lines = np.ascontiguousarray(lines, dtype=np.float64)
+    if len(lines):
+        painter.drawLines(shiboken6.wrapInstance(lines.ctypes.data, QLineF), len(lines))
+
+@lru_cache(maxsize=4096)
+def format_tick(value):
+    # Подпись отсечки; одни и те же значения повторяются от кадра к кадру
+    return f"{value:.1f}".rstrip('0').rstrip('.')
+
+ZOOM_STEP = 1.15  # Изменение масштаба за один шаг колеса мыши
+
+LOD_PIXEL_SIZE = 1.0  # Отрезки короче этой длины в пикселях рисуются как плотность
+LOD_DENSITY_STEP = 64  # Прибавка непрозрачности пикселя за каждый отрезок
+
+def window_snapshot(clip_area):
+    # Копия окна отсечения: (прямоугольник, многоугольник)
+    polygon = clip_area.clip_polygon
+    return (list(clip_area.clip_rect) if clip_area.clip_rect else None,
+            None if polygon is None else polygon.copy())
+
+class LoadSignals(QObject):
+    progress = Signal(int, int)  # прочитано, всего
+    partial = Signal(object, object, object)  # новые отсечённые отрезки, габариты сцены, окно
+    finished = Signal(object)  # загруженная сцена ClipArea
+    failed = Signal(str)
+    cancelled = Signal()
+
+class LoadWorker(QRunnable):
+    # Загрузка и отсечение файла в потоке пула. Сцена читается в отдельный
+    # объект ClipArea, который передаётся интерфейсу только после завершения,
+    # а до этого в интерфейс отправляются копии уже отсечённых порций,
+    # габаритов и окна: поток продолжает менять сцену, пока интерфейс рисует
+    def __init__(self, filename, algorithm=None):
+        super().__init__()
+        self.filename = filename
+        self.clip_area = ClipArea(algorithm or "cohen_sutherland")
+        self.signals = LoadSignals()
+        self.cancel_event = threading.Event()
     
-    def reset(self):
-        self.clip_rect = None
-        self.segments = []
-        self.clipped_segments = []
+    def cancel(self):
+        self.cancel_event.set()
     
-    def load_from_file(self, filename):
-        self.reset()
+    def run(self):
+        clip_area = self.clip_area
+        sent = 0
         try:
-            with open(filename, 'r') as f:
-                lines = f.readlines()
-                n = int(lines[0].strip())
-                
-                for i in range(1, n + 1):
-                    coords = list(map(float, lines[i].split()))
-                    if len(coords) >= 4:
-                        self.segments.append(coords[:4])
-                
-                if len(lines) > n + 1:
-                    rect_coords = list(map(float, lines[n + 1].split()))
-                    if len(rect_coords) >= 4:
-                        self.clip_rect = rect_coords[:4]
-                        self.cohen_sutherland_clip()
-        
+            with perf.measure("load_from_file"):
+                loader = clip_area.load_iter(self.filename)
+                for read, total in loader:
+                    if self.cancel_event.is_set():
+                        loader.close()
+                        self.signals.cancelled.emit()
+                        return
+                    parts = clip_area.clipped_parts[sent:]
+                    sent += len(parts)
+                    if parts:
+                        self.signals.partial.emit(np.concatenate(parts), list(clip_area.data_bounds()),
+                                                  window_snapshot(clip_area))
+                    self.signals.progress.emit(read, total)
+            # Сетка и кэш отсечения по её корзинам строятся здесь же, иначе
+            # первая отрисовка и первое перемещение окна строили бы их
+            # в потоке интерфейса
+            with perf.measure("spatial_index"):
+                clip_area.spatial_index()
+            clip_area.clip()
         except Exception as e:
-            print(f"Ошибка загрузки файла: {e}")
-            return False
-        return True
-    
-    def cohen_sutherland_clip(self):
-        if not self.clip_rect:
+            self.signals.failed.emit(str(e))
             return
-        
-        xmin, ymin, xmax, ymax = self.clip_rect
-        self.clipped_segments = []
-        
-        for segment in self.segments:
-            x1, y1, x2, y2 = segment
-            outcode1 = self.compute_outcode(x1, y1)
-            outcode2 = self.compute_outcode(x2, y2)
-            accept = False
-            
-            while True:
-                if not (outcode1 | outcode2):
-                    accept = True
-                    break
-                elif outcode1 & outcode2:
-                    break
-                else:
-                    outcode_out = outcode1 if outcode1 else outcode2
-                    
-                    if outcode_out & 1:
-                        x = xmin
-                        y = y1 + (y2 - y1) * (xmin - x1) / (x2 - x1) if x2 != x1 else y1
-                    elif outcode_out & 2:
-                        x = xmax
-                        y = y1 + (y2 - y1) * (xmax - x1) / (x2 - x1) if x2 != x1 else y1
-                    elif outcode_out & 4:
-                        y = ymin
-                        x = x1 + (x2 - x1) * (ymin - y1) / (y2 - y1) if y2 != y1 else x1
-                    elif outcode_out & 8:
-                        y = ymax
-                        x = x1 + (x2 - x1) * (ymax - y1) / (y2 - y1) if y2 != y1 else x1
-                    
-                    if outcode_out == outcode1:
-                        x1, y1 = x, y
-                        outcode1 = self.compute_outcode(x1, y1)
-                    else:
-                        x2, y2 = x, y
-                        outcode2 = self.compute_outcode(x2, y2)
-            
-            if accept:
-                self.clipped_segments.append([x1, y1, x2, y2])
-    
-    def compute_outcode(self, x, y):
-        if not self.clip_rect:
-            return 0
-        
-        xmin, ymin, xmax, ymax = self.clip_rect
-        code = 0
-        if x < xmin:
-            code |= 1
-        elif x > xmax:
-            code |= 2
-        if y < ymin:
-            code |= 4
-        elif y > ymax:
-            code |= 8
-        return code
+        self.signals.finished.emit(clip_area)
 
 class GraphicsWidget(QWidget):
     def __init__(self):
@@ -115,31 +105,64 @@ class GraphicsWidget(QWidget):
         self.scale = 1.0
         self.grid_step = 10  # Шаг сетки
         self.show_grid = True
+        self.lod_enabled = True  # Упрощённая отрисовка мелких отрезков
+        
+        # Кэш слоя осей и сетки и параметры вида, для которых он построен
+        self.axes_cache = None
+        self.axes_cache_key = None
+        # Изображения плотности мелких отрезков по цвету: (ключ, изображение)
+        self.density_cache = {}
+        
+        # Перетаскивание окна отсечения мышью
+        self.handle_size = 8  # Зона захвата сторон окна в пикселях
+        self.drag = None
+        self.pan = None
+        self.setMouseTracking(True)
+        
+        # Копии порций, отсечённых фоновой загрузкой, и окна загружаемой сцены;
+        # сама сцена до конца загрузки принадлежит потоку загрузки
+        self.preview = None
+        self.preview_window = (None, None)
+        self.preview_version = 0  # Число изменений показываемых порций
     
-    def load_data(self, filename):
-        if self.clip_area.load_from_file(filename):
+    def load_data(self, filename, algorithm=None):
+        if self.clip_area.load_from_file(filename, algorithm):
             self.auto_scale()
             self.update()
             return True
         return False
     
-    def auto_scale(self):
-        if not self.clip_area.segments and not self.clip_area.clip_rect:
-            return
-        
-        all_points = []
-        for seg in self.clip_area.segments:
-            all_points.extend([(seg[0], seg[1]), (seg[2], seg[3])])
-        
-        if self.clip_area.clip_rect:
-            xmin, ymin, xmax, ymax = self.clip_area.clip_rect
-            all_points.extend([(xmin, ymin), (xmax, ymax)])
-        
-        if all_points:
-            min_x = min(p[0] for p in all_points)
-            max_x = max(p[0] for p in all_points)
-            min_y = min(p[1] for p in all_points)
-            max_y = max(p[1] for p in all_points)
+    def start_preview(self):
+        self.preview = []
+        self.preview_window = (None, None)
+        self.preview_version += 1
+        self.update()
+    
+    def add_preview(self, clipped, bounds, window):
+        # Первая порция задаёт масштаб по габаритам уже прочитанной части
+        if not self.preview:
+            self.auto_scale(bounds)
+        self.preview.append(clipped)
+        self.preview_window = window
+        self.preview_version += 1
+        self.update()
+    
+    def stop_preview(self):
+        self.preview = None
+        self.preview_window = (None, None)
+        self.preview_version += 1
+        self.update()
+    
+    def set_clip_area(self, clip_area):
+        self.clip_area = clip_area
+        self.stop_preview()
+        self.auto_scale()
+    
+    def auto_scale(self, bounds=None):
+        if bounds is None:
+            bounds = self.clip_area.data_bounds()
+        if bounds is not None:
+            min_x, min_y, max_x, max_y = bounds
             
             # Добавляем отступы по краям (10%)
             padding_x = (max_x - min_x) * 0.1
@@ -199,6 +222,26 @@ class GraphicsWidget(QWidget):
         y = (self.height() - screen_y - self.offset_y) / self.scale
         return x, y
     
+    def axes_layer(self):
+        # Оси и сетка рисуются в отдельное изображение, которое
+        # перерисовывается только при изменении преобразования вида
+        ratio = self.devicePixelRatioF()
+        key = (self.scale, self.offset_x, self.offset_y, self.width(), self.height(),
+               self.grid_step, self.show_grid, ratio)
+        if self.axes_cache is None or key != self.axes_cache_key:
+            pixmap = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+            
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            self.draw_axes(painter)
+            painter.end()
+            
+            self.axes_cache = pixmap
+            self.axes_cache_key = key
+        return self.axes_cache
+    
     def draw_axes(self, painter):
         pen = QPen(QColor(255, 255, 255), 1)
         painter.setPen(pen)
@@ -248,7 +291,7 @@ class GraphicsWidget(QWidget):
             
             # Подпись значения
             if abs(x) > 1e-10:  # Не показывать 0 на обеих осях
-                value_text = f"{x:.1f}".rstrip('0').rstrip('.')
+                value_text = format_tick(x)
                 painter.drawText(screen_x - 15, y_zero_screen + 20, value_text)
             
             painter.setPen(grid_pen)
@@ -272,7 +315,7 @@ class GraphicsWidget(QWidget):
             
             # Подпись значения
             if abs(y) > 1e-10:  # Не показывать 0 на обеих осях
-                value_text = f"{y:.1f}".rstrip('0').rstrip('.')
+                value_text = format_tick(y)
                 painter.drawText(x_zero_screen + 10, screen_y + 5, value_text)
             
             painter.setPen(grid_pen)
@@ -304,16 +347,24 @@ class GraphicsWidget(QWidget):
         # Надпись в центре
         painter.drawText(self.width() // 2 - 20, 20, "(0,0)")
     
+    @perf.timed("paintEvent")
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
-        # Оси координат с отсечками
-        self.draw_axes(painter)
+        # Оси координат с отсечками (из кэшированного слоя)
+        painter.drawPixmap(0, 0, self.axes_layer())
+        
+        # Во время фоновой загрузки показывается окно загружаемой сцены
+        clip_area = self.clip_area
+        if self.preview is None:
+            clip_rect, clip_polygon = clip_area.clip_rect, clip_area.clip_polygon
+        else:
+            clip_rect, clip_polygon = self.preview_window
         
         # Отсекающее окно
-        if self.clip_area.clip_rect:
-            xmin, ymin, xmax, ymax = self.clip_area.clip_rect
+        if clip_rect:
+            xmin, ymin, xmax, ymax = clip_rect
             p1 = self.transform_point(xmin, ymin)
             p2 = self.transform_point(xmax, ymin)
             p3 = self.transform_point(xmax, ymax)
@@ -322,29 +373,262 @@ class GraphicsWidget(QWidget):
             pen = QPen(QColor(0, 255, 255), 2)
             painter.setPen(pen)
             painter.drawPolygon([p1, p2, p3, p4])
+        elif clip_polygon is not None:
+            points = [self.transform_point(x, y) for x, y in clip_polygon]
+            
+            pen = QPen(QColor(0, 255, 255), 2)
+            painter.setPen(pen)
+            painter.drawPolygon(points)
         
-        # Исходные отрезки
-        pen = QPen(QColor(255, 100, 100), 1)
-        painter.setPen(pen)
-        for segment in self.clip_area.segments:
-            x1, y1, x2, y2 = segment
-            p1 = self.transform_point(x1, y1)
-            p2 = self.transform_point(x2, y2)
-            painter.drawLine(p1, p2)
-        
-        # Отсеченные отрезки
-        pen = QPen(QColor(100, 255, 100), 3)
+        # Рисуются только отрезки, попадающие в видимую область
+        view = self.visible_world_rect()
+        
+        if self.preview is not None:
+            # Исходные отрезки ещё читаются, рисуются уже отсечённые порции
+            original = np.empty((0, 4))
+            clipped = np.concatenate(self.preview) if self.preview else original
+            clipped = clipped[segments_in_rect(clipped, view)]
+        else:
+            # Исходные отрезки, ломаные и многоугольники
+            original = np.concatenate((self.visible_segments(view),
+                                       self.primitive_segments(clip_area.polylines, False, view),
+                                       self.primitive_segments(clip_area.polygons, True, view)))
+            # Отсеченные отрезки, ломаные и многоугольники
+            clipped = np.concatenate((clip_area.clipped_in_rect(view),
+                                      self.primitive_segments(clip_area.clipped_polylines, False, view),
+                                      self.primitive_segments(clip_area.clipped_polygons, True, view)))
+        self.draw_segments(painter, original, QColor(255, 100, 100), 1)
+        self.draw_segments(painter, clipped, QColor(100, 255, 100), 3)
+        
+        if perf.enabled:
+            perf.count("нарисовано исходных", len(original))
+            perf.count("нарисовано отсечённых", len(clipped))
+            self.draw_hud(painter)
+    
+    def draw_hud(self, painter):
+        # Панель замеров: время этапов (последнее, медиана, 99-й перцентиль)
+        # и число нарисованных примитивов
+        lines = perf.hud_lines()
+        painter.save()
+        painter.setFont(QFont("Monospace", 9))
+        height = painter.fontMetrics().height()
+        painter.fillRect(5, 5, 420, height * len(lines) + 10, QColor(0, 0, 0, 200))
+        painter.setPen(QColor(255, 255, 0))
+        for i, line in enumerate(lines):
+            painter.drawText(10, 5 + height * (i + 1), line)
+        painter.restore()
+    
+    def visible_world_rect(self):
+        xmin, ymin = self.inverse_transform(0, self.height())
+        xmax, ymax = self.inverse_transform(self.width(), 0)
+        return [xmin, ymin, xmax, ymax]
+    
+    def visible_segments(self, view):
+        # Корзины сетки вне экрана отбрасываются целиком, корзины внутри
+        # экрана берутся целиком, проверяются только отрезки пограничных корзин
+        segments = self.clip_area.segments
+        if not len(segments):
+            return np.empty((0, 4))
+        
+        grid = self.clip_area.spatial_index()
+        state = grid.classify(view)
+        inside = np.asarray(segments[grid.gather(state == CELL_INSIDE)])
+        partial = np.asarray(segments[grid.gather(state == CELL_PARTIAL)])
+        return np.concatenate((inside, partial[segments_in_rect(partial, view)]))
+    
+    def primitive_segments(self, primitives, closed, view):
+        # Рёбра ломаных или многоугольников, попадающие в видимую область
+        edges, _ = primitive_edges(*primitives, closed)
+        return edges[segments_in_rect(edges, view)]
+    
+    def screen_coords(self, segments):
+        # Векторный перевод отрезков (N, 4) в экранные координаты
+        screen = np.asarray(segments, dtype=np.float64) * self.scale
+        screen[:, 0::2] += self.offset_x
+        screen[:, 1::2] = self.height() - (screen[:, 1::2] + self.offset_y)
+        return screen
+    
+    def view_transform(self):
+        # То же преобразование, что и transform_point, в виде матрицы QPainter
+        return QTransform(self.scale, 0, 0, -self.scale,
+                          self.offset_x, self.height() - self.offset_y)
+    
+    def draw_segments(self, painter, segments, color, width):
+        # Отрезки передаются в мировых координатах, перевод в экранные
+        # выполняет QPainter, поэтому при сдвиге и масштабировании меняется
+        # только матрица преобразования
+        segments = np.asarray(segments, dtype=np.float64)
+        
+        if self.lod_enabled:
+            # Отрезки короче пикселя не рисуются линиями, а накапливаются
+            # в изображение плотности
+            length = np.maximum(np.abs(segments[:, 2] - segments[:, 0]),
+                                np.abs(segments[:, 3] - segments[:, 1])) * self.scale
+            short = length < LOD_PIXEL_SIZE
+            if short.any():
+                self.draw_density(painter, segments[short], color)
+                segments = segments[~short]
+        
+        pen = QPen(color, width)
+        pen.setCosmetic(True)
+        painter.save()
+        painter.setTransform(self.view_transform())
         painter.setPen(pen)
-        for segment in self.clipped_segments:
-            x1, y1, x2, y2 = segment
-            p1 = self.transform_point(x1, y1)
-            p2 = self.transform_point(x2, y2)
-            painter.drawLine(p1, p2)
+        draw_line_array(painter, segments)
+        painter.restore()
+    
+    def draw_density(self, painter, segments, color):
+        # Изображение плотности, как и слой осей, строится заново только
+        # при изменении преобразования вида, размера виджета или данных
+        w, h = self.width(), self.height()
+        key = (self.scale, self.offset_x, self.offset_y, w, h, self.data_key(), len(segments))
+        cached = self.density_cache.get(color.rgba())
+        if cached is None or cached[0] != key:
+            screen = self.screen_coords(segments)
+            px = ((screen[:, 0] + screen[:, 2]) / 2).astype(np.int64)
+            py = ((screen[:, 1] + screen[:, 3]) / 2).astype(np.int64)
+            on_screen = (px >= 0) & (px < w) & (py >= 0) & (py < h)
+            counts = np.bincount(py[on_screen] * w + px[on_screen], minlength=w * h)
+            
+            # Прозрачность пикселя растёт с числом попавших в него отрезков
+            pixels = np.zeros((h, w, 4), dtype=np.uint8)
+            pixels[..., 0] = color.blue()
+            pixels[..., 1] = color.green()
+            pixels[..., 2] = color.red()
+            pixels[..., 3] = np.minimum(counts * LOD_DENSITY_STEP, 255).reshape(h, w)
+            # QImage не копирует буфер, поэтому массив хранится вместе с ним
+            image = QImage(pixels.data, w, h, 4 * w, QImage.Format_ARGB32)
+            cached = self.density_cache[color.rgba()] = (key, image, pixels)
+        painter.drawImage(0, 0, cached[1])
+    
+    def data_key(self):
+        # Состояние показываемых данных: сцена, число изменений её отрезков
+        # и результата отсечения, число порций фоновой загрузки
+        if self.preview is not None:
+            return ("preview", self.preview_version)
+        return (self.clip_area, self.clip_area.version)
+    
+    def window_handles(self, pos):
+        # Какие стороны окна захвачены курсором: (левая, нижняя, правая, верхняя).
+        # Внутри окна захватываются все стороны, то есть окно перемещается
+        clip_area = self.clip_area
+        if self.preview is not None:
+            # Во время загрузки окно не редактируется
+            return None
+        if clip_area.clip_polygon is not None:
+            x, y = self.inverse_transform(pos.x(), pos.y())
+            if points_in_polygon(np.array([x, y]), clip_area.clip_polygon):
+                return (True, True, True, True)
+            return None
+        if clip_area.clip_rect is None:
+            return None
+        
+        xmin, ymin, xmax, ymax = clip_area.clip_rect
+        p1 = self.transform_point(xmin, ymin)
+        p2 = self.transform_point(xmax, ymax)
+        h = self.handle_size
+        x, y = pos.x(), pos.y()
+        if not (p1.x() - h <= x <= p2.x() + h and p2.y() - h <= y <= p1.y() + h):
+            return None
+        
+        edges = (abs(x - p1.x()) <= h, abs(y - p1.y()) <= h,
+                 abs(x - p2.x()) <= h, abs(y - p2.y()) <= h)
+        if any(edges):
+            return edges
+        return (True, True, True, True)
+    
+    def update_cursor(self, edges):
+        if edges is None:
+            self.unsetCursor()
+        elif all(edges):
+            self.setCursor(Qt.SizeAllCursor)
+        elif (edges[0] and edges[3]) or (edges[2] and edges[1]):
+            self.setCursor(Qt.SizeFDiagCursor)
+        elif (edges[0] and edges[1]) or (edges[2] and edges[3]):
+            self.setCursor(Qt.SizeBDiagCursor)
+        elif edges[0] or edges[2]:
+            self.setCursor(Qt.SizeHorCursor)
+        else:
+            self.setCursor(Qt.SizeVerCursor)
+    
+    def mousePressEvent(self, event):
+        pos = event.position()
+        edges = self.window_handles(pos)
+        if event.button() == Qt.LeftButton and edges is not None:
+            window = self.clip_area.clip_rect
+            if self.clip_area.clip_polygon is not None:
+                window = self.clip_area.clip_polygon.copy()
+            self.drag = (edges, self.inverse_transform(pos.x(), pos.y()), window)
+        elif event.button() in (Qt.LeftButton, Qt.MiddleButton):
+            # Перетаскивание вне окна отсечения сдвигает вид
+            self.pan = (pos, self.offset_x, self.offset_y)
+            self.setCursor(Qt.ClosedHandCursor)
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        pos = event.position()
+        if self.pan is not None:
+            start, offset_x, offset_y = self.pan
+            self.offset_x = offset_x + pos.x() - start.x()
+            self.offset_y = offset_y - (pos.y() - start.y())
+            self.update()
+            return
+        if self.drag is None:
+            self.update_cursor(self.window_handles(pos))
+            return super().mouseMoveEvent(event)
+        
+        edges, (start_x, start_y), window = self.drag
+        x, y = self.inverse_transform(pos.x(), pos.y())
+        dx, dy = x - start_x, y - start_y
+        
+        # Повторно отсекаются только отрезки у старых и новых границ окна
+        if self.clip_area.clip_polygon is not None:
+            self.clip_area.set_clip_polygon(window + (dx, dy))
+            self.clip_area.clip()
+        else:
+            left, bottom, right, top = edges
+            xmin, ymin, xmax, ymax = window
+            xmin, xmax = xmin + dx * left, xmax + dx * right
+            ymin, ymax = ymin + dy * bottom, ymax + dy * top
+            self.clip_area.set_clip_rect([min(xmin, xmax), min(ymin, ymax),
+                                          max(xmin, xmax), max(ymin, ymax)])
+        self.update()
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.drag = None
+        if self.pan is not None and event.button() in (Qt.LeftButton, Qt.MiddleButton):
+            self.pan = None
+            self.update_cursor(self.window_handles(event.position()))
+        super().mouseReleaseEvent(event)
+    
+    def wheelEvent(self, event):
+        # Масштабирование относительно точки под курсором
+        steps = event.angleDelta().y() / 120
+        if not steps:
+            return
+        pos = event.position()
+        x, y = self.inverse_transform(pos.x(), pos.y())
+        self.scale *= ZOOM_STEP ** steps
+        self.offset_x = pos.x() - x * self.scale
+        self.offset_y = self.height() - pos.y() - y * self.scale
+        
+        xmin, ymin, xmax, ymax = self.visible_world_rect()
+        self.auto_grid_step(xmax - xmin, ymax - ymin)
+        self.update()
     
     def resizeEvent(self, event):
-        # При изменении размера окна пересчитываем масштаб
-        if self.clip_area.segments or self.clip_area.clip_rect:
-            self.auto_scale()
+        # Масштаб и точка сцены в центре виджета при изменении размера
+        # сохраняются, чтобы не сбрасывать выбранные колесом и сдвигом
+        # масштаб и положение. Вид подбирается по сцене только при первом
+        # показе виджета, затем - при загрузке файла
+        old = event.oldSize()
+        if old.width() < 0 or old.height() < 0:
+            if len(self.clip_area.segments) or self.clip_area.has_window():
+                self.auto_scale()
+        else:
+            self.offset_x += (self.width() - old.width()) / 2
+            self.offset_y += (self.height() - old.height()) / 2
         super().resizeEvent(event)
     
     @property
@@ -371,12 +655,43 @@ class MainWindow(QMainWindow):
         self.btn_reset = QPushButton("Сброс")
         self.btn_reset.clicked.connect(self.reset_view)
         
+        self.combo_algorithm = QComboBox()
+        for key, (title, _, _) in CLIP_ALGORITHMS.items():
+            self.combo_algorithm.addItem(title, key)
+        self.combo_algorithm.currentIndexChanged.connect(self.change_algorithm)
+        
+        self.check_lod = QCheckBox("Упрощение (LOD)")
+        self.check_lod.setChecked(True)
+        self.check_lod.toggled.connect(self.toggle_lod)
+        
+        self.check_perf = QCheckBox("Замеры")
+        self.check_perf.setChecked(perf.enabled)
+        self.check_perf.toggled.connect(self.toggle_perf)
+        
+        self.btn_trace = QPushButton("Сохранить трассу")
+        self.btn_trace.clicked.connect(self.save_trace)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        
+        self.btn_cancel = QPushButton("Отмена")
+        self.btn_cancel.clicked.connect(self.cancel_loading)
+        self.btn_cancel.hide()
+        
         self.label_status = QLabel("Готово к работе")
         self.label_status.setStyleSheet("color: white; padding: 5px;")
         
         control_layout.addWidget(self.btn_load)
         control_layout.addWidget(self.btn_reset)
+        control_layout.addWidget(QLabel("Алгоритм:"))
+        control_layout.addWidget(self.combo_algorithm)
+        control_layout.addWidget(self.check_lod)
+        control_layout.addWidget(self.check_perf)
+        control_layout.addWidget(self.btn_trace)
         control_layout.addStretch()
+        control_layout.addWidget(self.progress_bar)
+        control_layout.addWidget(self.btn_cancel)
         control_layout.addWidget(self.label_status)
         
         # Графический виджет
@@ -391,18 +706,101 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(info_label)
         
         main_layout.setStretch(1, 1)
+        
+        # Фоновая загрузка файла
+        self.worker = None
+        self.loading_name = None
     
     def load_file(self):
         filename, _ = QFileDialog.getOpenFileName(
-            self, "Выберите файл с данными", "", "Text Files (*.txt)"
+            self, "Выберите файл с данными", "", "Scene Files (*.txt *.clip);;Text Files (*.txt);;Binary Files (*.clip)"
         )
         
         if filename:
-            if self.graphics_widget.load_data(filename):
-                self.label_status.setText(f"Загружен файл: {filename.split('/')[-1]}")
-            else:
-                QMessageBox.warning(self, "Ошибка", "Не удалось загрузить файл")
-                self.label_status.setText("Ошибка загрузки файла")
+            self.start_loading(filename)
+    
+    def start_loading(self, filename):
+        # Файл читается и отсекается в пуле потоков, интерфейс остаётся
+        # отзывчивым и показывает уже отсечённые порции
+        worker = LoadWorker(filename, self.combo_algorithm.currentData())
+        worker.signals.progress.connect(self.loading_progress)
+        worker.signals.partial.connect(self.graphics_widget.add_preview)
+        worker.signals.finished.connect(self.loading_finished)
+        worker.signals.failed.connect(self.loading_failed)
+        worker.signals.cancelled.connect(self.loading_cancelled)
+        self.worker = worker
+        self.loading_name = filename.split('/')[-1]
+        
+        self.graphics_widget.start_preview()
+        self.set_loading(True)
+        self.label_status.setText(f"Загрузка: {self.loading_name}")
+        QThreadPool.globalInstance().start(worker)
+    
+    def set_loading(self, loading):
+        self.progress_bar.setVisible(loading)
+        self.progress_bar.setValue(0)
+        self.btn_cancel.setVisible(loading)
+        self.btn_load.setEnabled(not loading)
+        self.btn_reset.setEnabled(not loading)
+        self.combo_algorithm.setEnabled(not loading)
+    
+    def loading_progress(self, read, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(read)
+    
+    def loading_finished(self, clip_area):
+        self.worker = None
+        self.set_loading(False)
+        self.graphics_widget.set_clip_area(clip_area)
+        self.label_status.setText(f"Загружен файл: {self.loading_name}")
+    
+    def loading_failed(self, message):
+        self.worker = None
+        self.set_loading(False)
+        self.graphics_widget.stop_preview()
+        print(f"Ошибка загрузки файла: {message}")
+        QMessageBox.warning(self, "Ошибка", "Не удалось загрузить файл")
+        self.label_status.setText("Ошибка загрузки файла")
+    
+    def cancel_loading(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.btn_cancel.setEnabled(False)
+    
+    def loading_cancelled(self):
+        # Прежняя сцена остаётся на экране без изменений
+        self.worker = None
+        self.set_loading(False)
+        self.btn_cancel.setEnabled(True)
+        self.graphics_widget.stop_preview()
+        self.label_status.setText("Загрузка отменена")
+    
+    def closeEvent(self, event):
+        self.cancel_loading()
+        QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+    
+    def change_algorithm(self):
+        self.graphics_widget.clip_area.set_algorithm(self.combo_algorithm.currentData())
+        self.graphics_widget.update()
+    
+    def toggle_lod(self, checked):
+        self.graphics_widget.lod_enabled = checked
+        self.graphics_widget.update()
+    
+    def toggle_perf(self, checked):
+        perf.enabled = checked
+        if checked:
+            perf.clear()
+        self.graphics_widget.update()
+    
+    def save_trace(self):
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить трассу", "trace.json", "Trace Files (*.json)"
+        )
+        if filename:
+            count = perf.dump_trace(filename)
+            self.label_status.setText(f"Трасса сохранена: {count} событий")
     
     def reset_view(self):
         self.graphics_widget.clip_area.reset()
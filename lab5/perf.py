@@ -0,0 +1,128 @@
+# Файл и функция draw_line_array из main.py одинаковы в lab5 и lab6: каждая
+# лабораторная запускается из своего каталога, исправления вносятся в обе копии
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+PERF_ENV = "CG_PERF"  # Переменная окружения: 1 - включить замеры при запуске
+PERF_TRACE_ENV = "CG_PERF_TRACE"  # Файл трассы, записываемый при выходе
+PERF_CAPACITY = 1024  # Число последних замеров, хранимых для каждого этапа
+PERF_EVENTS = 16384  # Число последних событий, хранимых для трассы
+
+class PerfRecorder:
+    # Замеры времени этапов в кольцевых буферах; замеры приходят и из потоков
+    # пула, поэтому буферы меняются и читаются под блокировкой
+    def __init__(self, capacity=PERF_CAPACITY, events=PERF_EVENTS):
+        self.enabled = False
+        self.capacity = capacity
+        self.samples = {}
+        self.counters = {}
+        self.events = deque(maxlen=events)
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.counters.clear()
+            self.events.clear()
+
+    @contextmanager
+    def measure(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, args)
+
+    def timed(self, name):
+        # Декоратор: замер каждого вызова функции или метода
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.measure(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, start, duration, args=None):
+        with self.lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.capacity)
+            samples.append(duration)
+            self.events.append((name, start, duration, threading.get_ident(), args or {}))
+
+    def count(self, name, value):
+        # Счётчики (например, число нарисованных примитивов) в трассе
+        # отображаются графиками
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = value
+            self.events.append((name, time.perf_counter(), None, threading.get_ident(), value))
+
+    def stats(self, name):
+        # Последнее значение, медиана и 99-й перцентиль в миллисекундах
+        with self.lock:
+            samples = list(self.samples.get(name, ()))
+        if not samples:
+            return None
+        values = np.array(samples) * 1000
+        p50, p99 = np.percentile(values, [50, 99])
+        return {"last": values[-1], "p50": p50, "p99": p99, "count": len(values)}
+
+    def hud_lines(self, names=None):
+        # Строки для вывода поверх изображения
+        with self.lock:
+            names = list(names or self.samples)
+            counters = list(self.counters.items())
+        lines = []
+        for name in names:
+            stats = self.stats(name)
+            if stats is not None:
+                lines.append(f"{name}: {stats['last']:.2f} мс "
+                             f"(p50 {stats['p50']:.2f}, p99 {stats['p99']:.2f})")
+        for name, value in counters:
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def dump_trace(self, filename):
+        # Запись в формате Trace Event, который открывается в chrome://tracing
+        # и Perfetto: события "X" с длительностью и счётчики "C"
+        pid = os.getpid()
+        events = []
+        with self.lock:
+            recorded = list(self.events)
+        for name, start, duration, tid, args in recorded:
+            ts = (start - self.origin) * 1e6
+            if duration is None:
+                events.append({"name": name, "ph": "C", "ts": ts, "pid": pid, "tid": tid,
+                               "args": {name: args}})
+            else:
+                events.append({"name": name, "cat": "perf", "ph": "X", "ts": ts,
+                               "dur": duration * 1e6, "pid": pid, "tid": tid, "args": args})
+        with open(filename, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+perf = PerfRecorder()
+perf.enabled = os.environ.get(PERF_ENV) == "1"
+
+if os.environ.get(PERF_TRACE_ENV):
+    # Трасса записывается при выходе; замеры при этом включаются автоматически
+    perf.enabled = True
+    atexit.register(perf.dump_trace, os.environ[PERF_TRACE_ENV])
@@ -0,0 +1,321 @@
+import numpy as np
+
+# Ломаные и многоугольники хранятся одним массивом вершин (V, 2) и массивом
+# смещений (K + 1,): вершины k-го примитива - vertices[offsets[k]:offsets[k + 1]]
+
+def polygon_area(polygon):
+    # Ориентированная площадь: положительна при обходе против часовой стрелки
+    x, y = polygon[:, 0], polygon[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+def is_convex_polygon(polygon):
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    cross = edges[:, 0] * np.roll(edges[:, 1], -1) - edges[:, 1] * np.roll(edges[:, 0], -1)
+    cross = cross[cross != 0]
+    return len(cross) > 0 and (np.all(cross > 0) or np.all(cross < 0))
+
+def counterclockwise(polygon):
+    return polygon if polygon_area(polygon) >= 0 else polygon[::-1]
+
+def cross2(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+def points_in_polygon(points, polygon):
+    # Правило чётности для произвольного простого многоугольника:
+    # цикл идёт по рёбрам, все точки проверяются одновременно
+    x, y = points[..., 0], points[..., 1]
+    inside = np.zeros(x.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for (ax, ay), (bx, by) in zip(polygon, np.roll(polygon, -1, axis=0)):
+            crosses = (ay > y) != (by > y)
+            inside ^= crosses & (x < ax + (bx - ax) * (y - ay) / (by - ay))
+    return inside
+
+def empty_primitives():
+    return np.empty((0, 2)), np.zeros(1, dtype=np.int64)
+
+def primitives_from_lists(vertex_lists):
+    # Сборка общего массива вершин и смещений из списка массивов (k, 2)
+    if not vertex_lists:
+        return empty_primitives()
+    counts = [len(v) for v in vertex_lists]
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return np.concatenate(vertex_lists).reshape(-1, 2).astype(np.float64), offsets
+
+def select_primitives(vertices, offsets, keep):
+    # Выборка примитивов по маске без перебора в Python
+    counts = np.diff(offsets)
+    vertices = vertices[np.repeat(keep, counts)]
+    return vertices, np.concatenate(([0], np.cumsum(counts[keep]))).astype(np.int64)
+
+def primitive_edges(vertices, offsets, closed):
+    # Рёбра всех примитивов одним массивом (E, 4) и номер примитива каждого ребра.
+    # Рёбра одного примитива идут подряд в порядке обхода
+    counts = np.diff(offsets)
+    owner = np.repeat(np.arange(len(counts)), counts)
+    following = np.arange(1, len(vertices) + 1)
+    last = offsets[1:][counts > 0] - 1
+    if closed:
+        following[last] = offsets[:-1][counts > 0]
+        start = np.arange(len(vertices))
+    else:
+        start = np.ones(len(vertices), dtype=bool)
+        start[last] = False
+        start = np.flatnonzero(start)
+    return np.hstack((vertices[start], vertices[following[start]])), owner[start]
+
+def primitive_bounds(vertices, offsets):
+    # Габариты каждого непустого примитива: массив (K, 4)
+    starts = offsets[:-1][np.diff(offsets) > 0]
+    return np.column_stack((np.minimum.reduceat(vertices, starts),
+                            np.maximum.reduceat(vertices, starts)))
+
+def convex_intervals(segments, polygon):
+    # Параметры t0 <= t1 видимой части отрезков для выпуклого окна,
+    # как в алгоритме Кируса-Бека. Возвращает (номера, t0, t1)
+    p = segments[:, :2]
+    d = segments[:, 2:] - p
+    polygon = counterclockwise(polygon)
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    normals = np.column_stack((-edges[:, 1], edges[:, 0]))
+
+    t0 = np.zeros(len(segments))
+    t1 = np.ones(len(segments))
+    visible = np.ones(len(segments), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for a, n in zip(polygon, normals):
+            num = (p - a) @ n
+            den = d @ n
+            visible &= ~((den == 0) & (num < 0))
+            r = -num / den
+            t0 = np.where(den > 0, np.maximum(t0, r), t0)
+            t1 = np.where(den < 0, np.minimum(t1, r), t1)
+
+    visible &= t0 <= t1
+    return np.flatnonzero(visible), t0[visible], t1[visible]
+
+def general_intervals(segments, polygon, chunk_size=1 << 14):
+    # Параметры видимых частей отрезков для произвольного простого окна.
+    # Точки пересечения со всеми рёбрами окна делят отрезок на части,
+    # видимость части определяется по её середине. Соседние видимые части
+    # сливаются, поэтому отрезок даёт по одной части на каждый вход в окно
+    a = polygon
+    e = np.roll(polygon, -1, axis=0) - polygon
+    result = []
+    for start in range(0, len(segments), chunk_size):
+        chunk = segments[start:start + chunk_size]
+        p = chunk[:, :2]
+        d = chunk[:, 2:] - p
+
+        ap = a[None] - p[:, None]
+        den = cross2(d[:, None], e[None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = cross2(ap, e[None]) / den
+            u = cross2(ap, d[:, None]) / den
+        hit = (den != 0) & (t > 0) & (t < 1) & (u >= 0) & (u <= 1)
+        t = np.sort(np.where(hit, t, 1.0), axis=1)
+        bounds = np.hstack((np.zeros((len(chunk), 1)), t, np.ones((len(chunk), 1))))
+        t0, t1 = bounds[:, :-1], bounds[:, 1:]
+
+        mid = p[:, None] + (0.5 * (t0 + t1))[..., None] * d[:, None]
+        valid = t1 > t0
+        visible = points_in_polygon(mid, polygon) & valid
+
+        # Нулевые части (повторные пересечения) не разрывают видимый участок
+        idx = np.flatnonzero(valid)
+        row = idx // t0.shape[1]
+        vis = visible.ravel()[idx]
+        joined = np.zeros(len(idx), dtype=bool)
+        joined[1:] = vis[:-1] & (row[1:] == row[:-1])
+        continues = np.zeros(len(idx), dtype=bool)
+        continues[:-1] = vis[1:] & (row[1:] == row[:-1])
+        first = vis & ~joined
+        last = vis & ~continues
+        result.append((start + row[first], t0.ravel()[idx[first]], t1.ravel()[idx[last]]))
+
+    if not result:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    return tuple(np.concatenate(parts) for parts in zip(*result))
+
+def segment_intervals(segments, polygon, convex):
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    if convex:
+        return convex_intervals(segments, polygon)
+    return general_intervals(segments, polygon)
+
+def interval_points(segments, index, t):
+    # Точки на отрезках по параметру; концы (t = 0, t = 1) берутся точно
+    p = segments[index, :2]
+    q = segments[index, 2:]
+    points = p + t[:, None] * (q - p)
+    points[t == 0] = p[t == 0]
+    points[t == 1] = q[t == 1]
+    return points
+
+def clip_general_batch(segments, polygon, return_index=False):
+    # Отсечение отрезков невыпуклым окном; отрезок может дать несколько частей,
+    # тогда номер исходного отрезка в index повторяется
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    index, t0, t1 = general_intervals(segments, polygon)
+    result = np.hstack((interval_points(segments, index, t0),
+                        interval_points(segments, index, t1)))
+    if return_index:
+        return result, index
+    return result
+
+def clip_polylines(vertices, offsets, polygon, convex):
+    # Отсечение ломаных: все рёбра отсекаются одним пакетом, затем соседние
+    # видимые части, стыкующиеся в общей вершине, снова собираются в ломаные.
+    # Возвращает (вершины, смещения, номер исходной ломаной для каждой части)
+    segments, owner = primitive_edges(vertices, offsets, closed=False)
+    index, t0, t1 = segment_intervals(segments, polygon, convex)
+
+    joined = np.zeros(len(index), dtype=bool)
+    joined[1:] = ((index[1:] == index[:-1] + 1) & (owner[index[1:]] == owner[index[:-1]])
+                  & (t1[:-1] == 1) & (t0[1:] == 0))
+    new = ~joined
+
+    # Новая часть начинается своей первой точкой, каждая часть ребра
+    # добавляет свою конечную точку
+    end = np.cumsum(1 + new) - 1
+    result = np.empty((end[-1] + 1 if len(end) else 0, 2))
+    result[end] = interval_points(segments, index, t1)
+    result[end[new] - 1] = interval_points(segments, index[new], t0[new])
+
+    result_offsets = np.append(end[new] - 1, len(result)).astype(np.int64)
+    return result, result_offsets, owner[index[new]]
+
+def sutherland_hodgman_batch(vertices, offsets, polygon):
+    # Алгоритм Сазерленда-Ходжмана для выпуклого окна. Цикл идёт по рёбрам
+    # окна, на каждом шаге все многоугольники обрабатываются одновременно.
+    # Возвращает (вершины, смещения, номер исходного многоугольника)
+    polygon = counterclockwise(polygon)
+    source = np.arange(len(offsets) - 1)
+    for a, b in zip(polygon, np.roll(polygon, -1, axis=0)):
+        counts = np.diff(offsets)
+        if len(vertices) == 0:
+            break
+        # Предыдущая вершина по циклу внутри своего многоугольника
+        previous = np.arange(len(vertices)) - 1
+        nonempty = counts > 0
+        previous[offsets[:-1][nonempty]] = offsets[1:][nonempty] - 1
+
+        side = cross2(b - a, vertices - a)
+        inside = side >= 0
+        crossing = inside != inside[previous]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = side[previous] / (side[previous] - side)
+            start = vertices[previous]
+            intersection = start + t[:, None] * (vertices - start)
+
+        # Каждая вершина даёт точку пересечения входящего ребра (если ребро
+        # пересекает границу) и саму себя (если лежит внутри)
+        emitted = crossing.astype(np.int64) + inside
+        end = np.cumsum(emitted)
+        clipped = np.empty((end[-1] if len(end) else 0, 2))
+        clipped[(end - emitted)[crossing]] = intersection[crossing]
+        clipped[end[inside] - 1] = vertices[inside]
+
+        vertices = clipped
+        offsets = np.concatenate(([0], end))[offsets]
+
+    # Многоугольники, от которых осталось меньше трёх вершин, удаляются
+    keep = np.diff(offsets) >= 3
+    vertices, offsets = select_primitives(vertices, offsets, keep)
+    return vertices, offsets, source[keep]
+
+def cyclic_slice(array, start, stop):
+    if start < stop:
+        return array[start:stop]
+    return np.concatenate((array[start:], array[:stop]))
+
+def weiler_atherton(subject, window):
+    # Алгоритм Вейлера-Азертона для простого многоугольника и простого
+    # (в том числе невыпуклого) окна. Возвращает список многоугольников (k, 2).
+    # Пересечения всех рёбер находятся одной матричной операцией, обход
+    # выполняется по точкам пересечения, вершины между ними копируются срезами
+    subject = counterclockwise(subject)
+    window = counterclockwise(window)
+    s_dir = np.roll(subject, -1, axis=0) - subject
+    w_dir = np.roll(window, -1, axis=0) - window
+
+    den = cross2(s_dir[:, None], w_dir[None])
+    ws = window[None] - subject[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = cross2(ws, w_dir[None]) / den
+        u = cross2(ws, s_dir[:, None]) / den
+    hit = (den != 0) & (t >= 0) & (t < 1) & (u >= 0) & (u < 1)
+    si, wi = np.nonzero(hit)
+
+    if len(si) == 0:
+        # Границы не пересекаются: один многоугольник лежит в другом или они не пересекаются
+        if points_in_polygon(subject[:1], window)[0]:
+            return [subject]
+        if points_in_polygon(window[:1], subject)[0]:
+            return [window]
+        return []
+
+    ts, us = t[si, wi], u[si, wi]
+    points = subject[si] + ts[:, None] * s_dir[si]
+    # Ребро многоугольника входит в окно, если поворачивает влево от ребра окна
+    entering = den[si, wi] < 0
+    count = len(si)
+
+    def merged_list(vertices, edge, param):
+        # Вершины и точки пересечения в порядке обхода контура
+        keys = (np.concatenate((np.full(len(vertices), -1.0), param)),
+                np.concatenate((np.arange(len(vertices)), edge)))
+        order = np.lexsort(keys)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        position = rank[len(vertices):]
+        along = np.argsort(position)
+        following = np.empty(count, dtype=np.int64)
+        following[along] = np.roll(along, -1)
+        return np.concatenate((vertices, points))[order], position, following
+
+    s_list, s_pos, s_next = merged_list(subject, si, ts)
+    w_list, w_pos, w_next = merged_list(window, wi, us)
+
+    result = []
+    visited = np.zeros(count, dtype=bool)
+    for start in np.flatnonzero(entering):
+        if visited[start]:
+            continue
+        parts = []
+        k = start
+        for _ in range(count):
+            # От точки входа идём по многоугольнику до точки выхода,
+            # затем по окну до следующей точки входа
+            visited[k] = True
+            exit_k = s_next[k]
+            parts.append(cyclic_slice(s_list, s_pos[k], s_pos[exit_k]))
+            visited[exit_k] = True
+            k = w_next[exit_k]
+            parts.append(cyclic_slice(w_list, w_pos[exit_k], w_pos[k]))
+            if visited[k]:
+                break
+        piece = np.concatenate(parts)
+        if len(piece) >= 3:
+            result.append(piece)
+    return result
+
+def weiler_atherton_batch(vertices, offsets, window):
+    # Многоугольники, габариты которых не пересекают габариты окна,
+    # отбрасываются сразу; остальные отсекаются по одному
+    counts = np.diff(offsets)
+    candidates = np.flatnonzero(counts >= 3)
+    if len(candidates):
+        bounds = primitive_bounds(vertices, offsets)[np.flatnonzero(counts > 0).searchsorted(candidates)]
+        lo, hi = window.min(axis=0), window.max(axis=0)
+        overlap = np.all((bounds[:, :2] <= hi) & (bounds[:, 2:] >= lo), axis=1)
+        candidates = candidates[overlap]
+
+    pieces = []
+    source = []
+    for k in candidates:
+        for piece in weiler_atherton(vertices[offsets[k]:offsets[k + 1]], window):
+            pieces.append(piece)
+            source.append(k)
+    vertices, offsets = primitives_from_lists(pieces)
+    return vertices, offsets, np.array(source, dtype=np.int64)
@@ -0,0 +1,11 @@
+from batch_clip import expand_inputs, output_path
+
+def test_glob_skips_previous_results(tmp_path):
+    # Повторный запуск с тем же шаблоном не берёт результаты как входные файлы
+    for name in ("a.txt", "b.txt", "a.clipped.txt"):
+        (tmp_path / name).write_text("0\n")
+    files = expand_inputs([str(tmp_path / "*.txt")])
+    assert files == [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+    assert output_path(files[0]) == str(tmp_path / "a.clipped.txt")
+    # Явно названный файл результата обрабатывается
+    assert expand_inputs([str(tmp_path / "a.clipped.txt")]) == [str(tmp_path / "a.clipped.txt")]
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from clip_area import (ClipArea, cohen_sutherland_batch, liang_barsky_batch,
+                       cyrus_beck_batch, rect_to_polygon, segments_in_rect)
+from polygon_clip import clip_general_batch
+
+CLIP_RECT = [-3.0, -2.0, 4.0, 5.0]
+
+def random_segments(count, seed=0, extent=10.0):
+    # Случайные отрезки вокруг окна: часть внутри, часть снаружи,
+    # часть пересекает границы; добавлены вертикальные и горизонтальные
+    rng = np.random.default_rng(seed)
+    segments = rng.uniform(-extent, extent, (count, 4))
+    segments[::7, 2] = segments[::7, 0]
+    segments[::11, 3] = segments[::11, 1]
+    return segments
+
+def make_area(segments, clip_rect=CLIP_RECT):
+    area = ClipArea()
+    area.segments = np.asarray(segments, dtype=np.float64)
+    area.clip_rect = list(clip_rect)
+    return area
+
+def test_batch_matches_scalar_reference():
+    area = make_area(random_segments(2000))
+    expected = np.array(area.cohen_sutherland_clip_scalar()).reshape(-1, 4)
+    area.cohen_sutherland_clip()
+    np.testing.assert_allclose(area.clipped_segments, expected, atol=1e-9)
+
+@pytest.mark.parametrize("clip_func, window", [
+    (liang_barsky_batch, CLIP_RECT),
+    (cyrus_beck_batch, rect_to_polygon(CLIP_RECT)),
+])
+def test_parametric_algorithms_match_cohen_sutherland(clip_func, window):
+    segments = random_segments(2000, seed=1)
+    expected, expected_index = cohen_sutherland_batch(segments, CLIP_RECT, True)
+    clipped, index = clip_func(segments, window, True)
+    # Отрезки, касающиеся окна в одной точке, алгоритмы могут решать по-разному
+    length = np.hypot(expected[:, 2] - expected[:, 0], expected[:, 3] - expected[:, 1])
+    keep = np.isin(index, expected_index[length > 1e-9])
+    np.testing.assert_array_equal(index[keep], expected_index[length > 1e-9])
+    np.testing.assert_allclose(clipped[keep], expected[length > 1e-9], atol=1e-9)
+
+def test_grid_reclip_matches_full_clip():
+    # Окно перемещается и меняет размер, как при перетаскивании мышью;
+    # после каждого шага результат совпадает с отсечением всей сцены
+    segments = random_segments(5000, seed=2)
+    area = make_area(segments)
+    area.clip()
+    rng = np.random.default_rng(3)
+    rect = np.array(CLIP_RECT)
+    for _ in range(30):
+        rect = rect + rng.uniform(-0.7, 0.7, 4)
+        rect[2:] = np.maximum(rect[2:], rect[:2] + 0.1)
+        area.set_clip_rect(rect)
+        expected = cohen_sutherland_batch(segments, rect)
+        np.testing.assert_allclose(area.clipped_segments, expected, atol=1e-9)
+        np.testing.assert_allclose(area.clipped_in_rect([-1, -1, 1, 1]),
+                                   expected[segments_in_rect(expected, [-1, -1, 1, 1])], atol=1e-9)
+
+def test_grid_reclip_follows_polygon_window():
+    # Выпуклое окно перетаскивается, затем сменяется прямоугольником и обратно
+    segments = random_segments(5000, seed=4)
+    area = make_area(segments)
+    area.clip()
+    polygon = np.array([[-3.0, -2.0], [4.0, -3.0], [5.0, 2.0], [0.0, 6.0]])
+    rng = np.random.default_rng(5)
+    for step in range(20):
+        if step == 10:
+            area.set_clip_rect(CLIP_RECT)
+        else:
+            polygon = polygon + rng.uniform(-0.7, 0.7, 2)
+            area.set_clip_polygon(polygon)
+            area.clip()
+        expected = area.clip_segments(segments)
+        np.testing.assert_allclose(area.clipped_segments, expected, atol=1e-9)
+
+@pytest.mark.parametrize("tail, window", [
+    ("", None),
+    ("polyline 0 0 5 5\n", None),
+    ("polyline 0 0 5 5\n0 0 2.5 2.5\n", [0.0, 0.0, 2.5, 2.5]),
+    ("0 0 2.5 2.5\n\n", [0.0, 0.0, 2.5, 2.5]),
+])
+def test_load_window_from_last_line(tmp_path, tail, window):
+    # Последняя строка файла без окна - отрезок; до конца чтения отрезков
+    # неизвестно, окно ли это, поэтому сцене не назначаются ни окно,
+    # ни отсечённые по нему порции
+    filename = tmp_path / "scene.txt"
+    filename.write_text("3\n-1 -1 1 1\n0 0 1 1\n2 2 3 3\n" + tail)
+    area = ClipArea()
+    for _ in area.load_iter(str(filename), chunk_size=1):
+        assert not area.has_window()
+        assert area.clipped_parts == []
+    assert len(area.segments) == 3
+    assert area.clip_rect == window
+    if window is not None:
+        expected = cohen_sutherland_batch(area.segments, window)
+        np.testing.assert_allclose(area.clipped_segments, expected)
+        np.testing.assert_allclose(np.concatenate(area.clipped_parts), expected)
+
+def test_grid_reclip_follows_concave_window():
+    # Невыпуклое окно разбивает отрезки на части; при перетаскивании
+    # заменяются только части отрезков у смещённых сторон
+    segments = random_segments(5000, seed=6)
+    area = make_area(segments)
+    polygon = np.array([[-4.0, -4.0], [4.0, -4.0], [4.0, 4.0], [0.0, -1.0], [-4.0, 4.0]])
+    area.set_clip_polygon(polygon)
+    area.clip()
+    # Сдвиги вдоль осей вырождают заметаемые горизонтальными и вертикальными сторонами области
+    shifts = np.vstack((np.random.default_rng(7).uniform(-0.7, 0.7, (20, 2)),
+                        [[0.5, 0.0], [0.0, -0.5], [-0.5, 0.0]]))
+    for shift in shifts:
+        polygon = polygon + shift
+        area.set_clip_polygon(polygon)
+        area.clip()
+        expected = clip_general_batch(segments, polygon)
+        np.testing.assert_allclose(area.clipped_segments, expected, atol=1e-9)
@@ -0,0 +1,150 @@
+import numpy as np
+
+from perf import perf
+
+BVH_LEAF_SIZE = 8  # Число примитивов в листе иерархии
+MORTON_BITS = 10  # Бит на координату в коде Мортона
+
+def spread_bits(values):
+    # Раздвигает младшие 10 бит числа так, чтобы между ними было по два
+    # нулевых бита: b9..b0 -> b9 0 0 b8 0 0 ... b0
+    x = values.astype(np.uint32) & 0x3FF
+    x = (x | (x << 16)) & 0x030000FF
+    x = (x | (x << 8)) & 0x0300F00F
+    x = (x | (x << 4)) & 0x030C30C3
+    x = (x | (x << 2)) & 0x09249249
+    return x
+
+def morton_codes(points):
+    # Коды Мортона точек (N, 3): координаты переводятся в целые
+    # в пределах охватывающего параллелепипеда, биты осей чередуются.
+    # Близкие в пространстве точки получают близкие коды
+    low, high = points.min(axis=0), points.max(axis=0)
+    size = np.where(high > low, high - low, 1)
+    cells = ((points - low) / size * ((1 << MORTON_BITS) - 1)).astype(np.uint32)
+    return (spread_bits(cells[:, 0]) << 2) | (spread_bits(cells[:, 1]) << 1) | spread_bits(cells[:, 2])
+
+def primitive_bounds(points, primitives):
+    # Охватывающие параллелепипеды примитивов (рёбер или треугольников):
+    # нижние и верхние углы (M, 3)
+    corners = [points[primitives[:, k]] for k in range(primitives.shape[1])]
+    lower, upper = corners[0], corners[0]
+    for corner in corners[1:]:
+        lower, upper = np.minimum(lower, corner), np.maximum(upper, corner)
+    return lower, upper
+
+def ray_triangles(origins, directions, a, b, c):
+    # Параметры t пересечения лучей origin + t * direction с треугольниками
+    # abc (алгоритм Мёллера-Трумбора, с обеих сторон треугольника);
+    # inf, если пересечения нет
+    ab, ac = b - a, c - a
+    p = np.cross(directions, ac)
+    det = (ab * p).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1 / det
+        s = origins - a
+        u = (s * p).sum(axis=1) * inverse
+        q = np.cross(s, ab)
+        v = (directions * q).sum(axis=1) * inverse
+        t = (ac * q).sum(axis=1) * inverse
+    hit = (det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1)
+    return np.where(hit, t, np.inf)
+
+class BVH:
+    # Полное двоичное дерево параллелепипедов над примитивами, отсортированными
+    # по кодам Мортона; у узла i уровня level потомки 2i и 2i + 1
+    def __init__(self, lower, upper):
+        self.count = len(lower)
+        leaves = max(-(-self.count // BVH_LEAF_SIZE), 1)
+        self.depth = int(np.ceil(np.log2(leaves)))
+        slots = (1 << self.depth) * BVH_LEAF_SIZE
+
+        # Порядок примитивов в листьях; пустые места в последних листьях
+        # заполняются пустыми параллелепипедами (нижний угол выше верхнего)
+        self.order = np.argsort(morton_codes((lower + upper) / 2), kind='stable') \
+            if self.count else np.empty(0, dtype=np.int64)
+        box_lower = np.full((slots, 3), np.inf)
+        box_upper = np.full((slots, 3), -np.inf)
+        box_lower[:self.count] = lower[self.order]
+        box_upper[:self.count] = upper[self.order]
+
+        box_lower = box_lower.reshape(-1, BVH_LEAF_SIZE, 3)
+        box_upper = box_upper.reshape(-1, BVH_LEAF_SIZE, 3)
+        level_lower, level_upper = box_lower[:, 0], box_upper[:, 0]
+        for k in range(1, BVH_LEAF_SIZE):
+            level_lower = np.minimum(level_lower, box_lower[:, k])
+            level_upper = np.maximum(level_upper, box_upper[:, k])
+        self.lower, self.upper = [level_lower], [level_upper]
+        while len(level_lower) > 1:
+            level_lower = np.minimum(level_lower[0::2], level_lower[1::2])
+            level_upper = np.maximum(level_upper[0::2], level_upper[1::2])
+            self.lower.insert(0, level_lower)
+            self.upper.insert(0, level_upper)
+
+    def primitives(self, instances, level, nodes):
+        # Номера примитивов (в нумерации всех экземпляров instance * count
+        # + primitive) под узлами nodes уровня level
+        shift = self.depth - level
+        first = np.minimum((nodes << shift) * BVH_LEAF_SIZE, self.count)
+        last = np.minimum(((nodes + 1) << shift) * BVH_LEAF_SIZE, self.count)
+        sizes = last - first
+        slots = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes - first, sizes)
+        return np.repeat(instances * self.count, sizes) + self.order[slots]
+
+    @perf.timed("bvh_cull")
+    def cull(self, planes):
+        # planes (K, 6, 4) - плоскости пирамиды в системе координат модели;
+        # возвращает номера примитивов instance * count + primitive
+        instances = np.arange(len(planes))
+        nodes = np.zeros(len(planes), dtype=np.int64)
+        mask = np.zeros(len(planes) * self.count, dtype=bool)
+        for level in range(self.depth + 1):
+            lower, upper = self.lower[level][nodes], self.upper[level][nodes]
+            valid = lower[:, 0] <= upper[:, 0]
+            instances, nodes = instances[valid], nodes[valid]
+            lower, upper = lower[valid], upper[valid]
+            # Ближайший и дальний по нормали плоскости углы параллелепипеда
+            plane = planes[instances]
+            normal = plane[:, :, :3]
+            positive = normal > 0
+            far = np.where(positive, upper[:, None], lower[:, None])
+            near = np.where(positive, lower[:, None], upper[:, None])
+            outside = ((normal * far).sum(axis=2) + plane[:, :, 3] < 0).any(axis=1)
+            inside = ((normal * near).sum(axis=2) + plane[:, :, 3] >= 0).all(axis=1)
+
+            accept = inside & ~outside if level < self.depth else ~outside
+            if level == 0:
+                mask.reshape(len(planes), -1)[instances[accept]] = True
+            else:
+                mask[self.primitives(instances[accept], level, nodes[accept])] = True
+            descend = ~inside & ~outside
+            instances = np.repeat(instances[descend], 2)
+            nodes = (np.repeat(nodes[descend], 2) * 2) + np.tile([0, 1], descend.sum())
+            if not len(nodes):
+                break
+        return np.flatnonzero(mask)
+
+    @perf.timed("bvh_ray")
+    def ray_candidates(self, origins, directions):
+        # Примитивы листьев, параллелепипеды которых пересекает отрезок
+        # луча origin + t * direction, 0 <= t <= 1. origins и directions
+        # (K, 3) - лучи в системах координат K экземпляров. Возвращает
+        # номера примитивов ray * count + primitive
+        rays = np.arange(len(origins))
+        nodes = np.zeros(len(origins), dtype=np.int64)
+        with np.errstate(divide='ignore'):
+            inverse = 1 / directions
+        for level in range(self.depth + 1):
+            lower, upper = self.lower[level][nodes], self.upper[level][nodes]
+            with np.errstate(invalid='ignore'):
+                t1 = (lower - origins[rays]) * inverse[rays]
+                t2 = (upper - origins[rays]) * inverse[rays]
+            # fmin и fmax пропускают NaN (луч вдоль грани параллелепипеда)
+            enter = np.fmax.reduce(np.fmin(t1, t2), axis=1)
+            leave = np.fmin.reduce(np.fmax(t1, t2), axis=1)
+            hit = (lower[:, 0] <= upper[:, 0]) & (enter <= leave) & (leave >= 0) & (enter <= 1)
+            rays, nodes = rays[hit], nodes[hit]
+            if level < self.depth:
+                rays = np.repeat(rays, 2)
+                nodes = np.repeat(nodes, 2) * 2 + np.tile([0, 1], len(nodes))
+        return self.primitives(rays, self.depth, nodes)
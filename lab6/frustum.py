@@ -0,0 +1,115 @@
+import numpy as np
+
+# Плоскости пирамиды видимости в пространстве отсечения: точка (x, y, z, w)
+# лежит внутри, если для каждой плоскости plane @ point >= 0, то есть
+# -w <= x <= w, -w <= y <= w, -w <= z <= w
+FRUSTUM_PLANES = np.array([
+    [1, 0, 0, 1], [-1, 0, 0, 1],
+    [0, 1, 0, 1], [0, -1, 0, 1],
+    [0, 0, 1, 1], [0, 0, -1, 1],
+], dtype=np.float64)
+NEAR_PLANE = 4  # Номер ближней плоскости z >= -w
+
+def plane_distances(clip):
+    # Расстояния (со знаком) от вершин (N, 4) до плоскостей (N, 6)
+    return clip @ FRUSTUM_PLANES.T
+
+def outcodes(distances):
+    # Коды областей, как в алгоритме Коэна-Сазерленда: бит k - вершина
+    # снаружи плоскости k
+    return (distances < 0) @ (1 << np.arange(len(FRUSTUM_PLANES)))
+
+def inside_frustum(codes, primitives):
+    # Примитив (ребро или треугольник) отбрасывается, если все его вершины
+    # лежат снаружи одной и той же плоскости
+    common = codes[primitives[:, 0]]
+    for k in range(1, primitives.shape[1]):
+        common = common & codes[primitives[:, k]]
+    return common == 0
+
+def clip_edges(clip, edges, distances=None, return_index=False):
+    # Отсечение рёбер пирамидой видимости в однородных координатах:
+    # параметрический алгоритм Лианга-Барски, в котором вместо сторон окна
+    # используются шесть плоскостей. Отсечение до деления на w убирает
+    # отражение вершин, лежащих позади камеры. Возвращает отрезки (K, 2, 4)
+    if distances is None:
+        distances = plane_distances(clip)
+    codes = outcodes(distances)
+    start, end = codes[edges[:, 0]], codes[edges[:, 1]]
+    index = np.flatnonzero((start & end) == 0)
+    # Рёбра целиком внутри не требуют вычислений
+    partial = (start[index] | end[index]) != 0
+
+    segments = clip[edges[index]]
+    part = edges[index[partial]]
+    d0, d1 = distances[part[:, 0]], distances[part[:, 1]]
+    t0 = np.zeros(len(part))
+    t1 = np.ones(len(part))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k in range(len(FRUSTUM_PLANES)):
+            r = d0[:, k] / (d0[:, k] - d1[:, k])
+            t0 = np.where(d0[:, k] < 0, np.maximum(t0, r), t0)
+            t1 = np.where(d1[:, k] < 0, np.minimum(t1, r), t1)
+    p0, p1 = clip[part[:, 0]], clip[part[:, 1]]
+    segments[partial, 0] = p0 + t0[:, None] * (p1 - p0)
+    segments[partial, 1] = p0 + t1[:, None] * (p1 - p0)
+
+    visible = np.ones(len(index), dtype=bool)
+    visible[partial] = t0 <= t1
+    if return_index:
+        return segments[visible], index[visible]
+    return segments[visible]
+
+def front_facing(clip, triangles):
+    # Лицевые треугольники: обход вершин против часовой стрелки на экране.
+    # Знак определителя из координат x, y, w вершин совпадает со знаком
+    # площади треугольника после деления на w, деление не требуется
+    a, b, c = clip[triangles[:, 0]], clip[triangles[:, 1]], clip[triangles[:, 2]]
+    det = (a[:, 0] * (b[:, 1] * c[:, 3] - b[:, 3] * c[:, 1]) -
+           a[:, 1] * (b[:, 0] * c[:, 3] - b[:, 3] * c[:, 0]) +
+           a[:, 3] * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0]))
+    return det > 0
+
+def clip_triangles_near(clip, near, triangles, attributes=None):
+    # Сазерленд-Ходжман для ближней плоскости; near - расстояния вершин до неё.
+    # Новые вершины и атрибуты добавляются в конец массивов
+    if not len(triangles) or near[triangles].min() >= 0:
+        # Обычный случай: все вершины перед камерой
+        return clip, triangles, attributes, np.arange(len(triangles))
+    inside = near[triangles] >= 0
+    count = inside.sum(axis=1)
+    whole = np.flatnonzero(count == 3)
+    result, source = [triangles[whole]], [whole]
+    new_points, new_values = [], []
+
+    def intersection(p, q):
+        # Точки пересечения рёбер p-q с плоскостью и их номера
+        start = len(clip) + sum(len(v) for v in new_points)
+        t = (near[p] / (near[p] - near[q]))[:, None]
+        new_points.append(clip[p] + t * (clip[q] - clip[p]))
+        if attributes is not None:
+            new_values.append(attributes[p] + t * (attributes[q] - attributes[p]))
+        return np.arange(start, start + len(p))
+
+    for kept, odd in ((1, inside), (2, ~inside)):
+        rows = np.flatnonzero(count == kept)
+        if not len(rows):
+            continue
+        # Поворот вершин так, чтобы первой была единственная вершина
+        # своего вида (внутри для kept = 1, снаружи для kept = 2)
+        shift = (np.argmax(odd[rows], axis=1)[:, None] + np.arange(3)) % 3
+        o, a, b = triangles[rows[:, None], shift].T
+        if kept == 1:
+            oa, ob = intersection(o, a), intersection(o, b)
+            result.append(np.column_stack((o, oa, ob)))
+            source.append(rows)
+        else:
+            bo, oa = intersection(b, o), intersection(o, a)
+            result += [np.column_stack((a, b, bo)), np.column_stack((a, bo, oa))]
+            source += [rows, rows]
+
+    if new_points:
+        clip = np.concatenate([clip] + new_points)
+        if attributes is not None:
+            attributes = np.concatenate([attributes] + new_values)
+    return clip, np.concatenate(result).astype(np.int32), attributes, np.concatenate(source)
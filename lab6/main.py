@@ -4,124 +4,256 @@ import numpy as np
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QSlider, QGroupBox, QGridLayout,
-    QRadioButton
+    QRadioButton, QCheckBox, QFileDialog, QMessageBox, QSpinBox
 )
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QLineF, QPointF, QRectF, QThreadPool, Signal
 from PySide6.QtGui import QPainter, QPen, QColor, QFont
+import shiboken6
+
+from perf import perf
+from mesh_io import load_mesh, face_edges, triangulate, empty_faces, faces_from_counts
+from rasterizer import Rasterizer, face_normals, vertex_normals, lighting, pack_colors
+from frustum import (plane_distances, outcodes, inside_frustum, clip_edges,
+                     front_facing, clip_triangles_near, FRUSTUM_PLANES, NEAR_PLANE)
+from scene import (grid_scene, transform_instances, instance_indices,
+                   instance_primitives, instance_normals)
+from bvh import BVH, primitive_bounds, ray_triangles
+from viewports import perspective, default_viewports
+from scheduler import FrameScheduler
+
+MESH_FIT_SIZE = 3.0  # Размер наибольшей стороны загруженной сетки (как у буквы "A")
+INSTANCE_SPACING = 1.5 * MESH_FIT_SIZE  # Шаг решётки экземпляров сетки
+MAX_INSTANCES = 10000  # Наибольшее число экземпляров в сцене
+PICK_RADIUS = 8  # Расстояние в пикселях, на котором выбирается вершина или ребро
+SELECTION_NAMES = {"vertex": "вершина", "edge": "ребро", "face": "грань"}
+
+def draw_line_array(painter, lines):
+    # Массив отрезков (N, 4) передаётся в drawLines как QLineF* без копирования
+    lines = np.ascontiguousarray(lines, dtype=np.float64)
+    if len(lines):
+        painter.drawLines(shiboken6.wrapInstance(lines.ctypes.data, QLineF), len(lines))
+
+def homogeneous(points):
+    # Точки (N, 3) в однородных координатах (N, 4) с w = 1
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    return np.column_stack((points, np.ones(len(points))))
+
+def axis_rotation(axis, degrees):
+    # Матрица поворота 3x3 вокруг оси X (0), Y (1) или Z (2)
+    angle = math.radians(degrees)
+    c, s = math.cos(angle), math.sin(angle)
+    if axis == 0:
+        return np.array([[1, 0, 0], [0, c, -s], [0, s, c]])
+    if axis == 1:
+        return np.array([[c, 0, s], [0, 1, 0], [-s, 0, c]])
+    return np.array([[c, -s, 0], [s, c, 0], [0, 0, 1]])
+
+class TransformState:
+    # Параметры преобразования и кэш матриц, пересчитываемых при первом запросе
+    def __init__(self):
+        self.rotation = [0, 0, 0]  # Углы поворота вокруг X, Y, Z в градусах
+        self.scale = 1.0
+        self.translation = [0.0, 0.0, 0.0]
+        
+        self.rotation_matrices = [np.eye(3), np.eye(3), np.eye(3)]
+        self.rotation_matrix = np.eye(3)
+        self.dirty_axes = set()
+        self.model_dirty = False
+        self.model = np.eye(4)
+        
+        # Итоговая матрица P @ T и матрица проекции, для которой она вычислена
+        self.mvp = None
+        self.mvp_projection = None
+        self.version = 0  # Число пересчётов матрицы модели
+    
+    def set_rotation(self, axis, degrees):
+        if self.rotation[axis] != degrees:
+            self.rotation[axis] = degrees
+            self.dirty_axes.add(axis)
+            self.model_dirty = True
+    
+    def set_scale(self, scale):
+        if self.scale != scale:
+            self.scale = scale
+            self.model_dirty = True
+    
+    def set_translation(self, axis, value):
+        if self.translation[axis] != value:
+            self.translation[axis] = value
+            self.model_dirty = True
+    
+    def reset(self):
+        for axis in range(3):
+            self.set_rotation(axis, 0)
+            self.set_translation(axis, 0.0)
+        self.set_scale(1.0)
+    
+    def model_matrix(self):
+        if self.model_dirty:
+            with perf.measure("update_transform_matrix"):
+                self.rebuild()
+        return self.model
+    
+    def rebuild(self):
+        # Пересчитываются только повороты с изменившимся углом. Масштаб
+        # и перенос подставляются в матрицу T * R * S без умножения матриц
+        for axis in self.dirty_axes:
+            self.rotation_matrices[axis] = axis_rotation(axis, self.rotation[axis])
+        if self.dirty_axes:
+            rx, ry, rz = self.rotation_matrices
+            self.rotation_matrix = rz @ ry @ rx
+            self.dirty_axes.clear()
+        
+        model = np.eye(4)
+        model[:3, :3] = self.rotation_matrix * self.scale
+        model[:3, 3] = self.translation
+        self.model = model
+        self.model_dirty = False
+        self.mvp = None
+        self.version += 1
+    
+    def copy(self):
+        # Независимая копия параметров и кэша; матрицы при пересчёте
+        # заменяются, а не изменяются, поэтому их можно не копировать
+        state = TransformState()
+        state.rotation = list(self.rotation)
+        state.scale = self.scale
+        state.translation = list(self.translation)
+        state.rotation_matrices = list(self.rotation_matrices)
+        state.rotation_matrix = self.rotation_matrix
+        state.dirty_axes = set(self.dirty_axes)
+        state.model_dirty = self.model_dirty
+        state.model = self.model
+        return state
+    
+    def mvp_matrix(self, projection):
+        model = self.model_matrix()
+        if self.mvp is None or self.mvp_projection is not projection:
+            self.mvp = projection @ model
+            self.mvp_projection = projection
+        return self.mvp
 
 class ThreeDObject:
     def __init__(self):
-        self.vertices = []
-        self.edges = []
+        # Вершины хранятся в однородных координатах (N, 4),
+        # рёбра - парами номеров вершин (E, 2)
+        self.vertices = np.empty((0, 4))
+        self.edges = np.empty((0, 2), dtype=np.int32)
+        # Грани: номера вершин подряд и смещения граней, а также
+        # разбиение граней на треугольники (T, 3)
+        self.face_indices, self.face_offsets = empty_faces()
+        self.face_edge_index = np.empty(0, dtype=np.int32)
+        self.triangles = np.empty((0, 3), dtype=np.int32)
+        self.face_normals = np.empty((0, 3))
+        self.vertex_normals = np.empty((0, 3))
+        # Номер грани каждого треугольника и иерархии параллелепипедов
+        # над треугольниками и рёбрами для отсечения и выбора мышью
+        self.triangle_face = np.empty(0, dtype=np.int64)
+        self.triangle_bvh = None
+        self.edge_bvh = None
+        
+    def set_mesh(self, vertices, indices, offsets):
+        # Рёбра, треугольники и нормали модели; объект меняется только после
+        # успешного построения всех массивов
+        edges, face_edge_index = face_edges(indices, offsets, return_inverse=True)
+        triangles = triangulate(indices, offsets)
+        counts = np.diff(offsets)
+        triangle_face = np.repeat(np.arange(len(counts)), np.maximum(counts - 2, 0))
+        points = vertices[:, :3].astype(np.float64)
+        normals = face_normals(points, triangles), vertex_normals(points, triangles)
+        bvhs = BVH(*primitive_bounds(points, triangles)), BVH(*primitive_bounds(points, edges))
+        
+        self.vertices = vertices
+        self.face_indices, self.face_offsets = indices, offsets
+        self.edges, self.face_edge_index = edges, face_edge_index
+        self.triangles, self.triangle_face = triangles, triangle_face
+        self.face_normals, self.vertex_normals = normals
+        self.triangle_bvh, self.edge_bvh = bvhs
+        
+    def load_mesh(self, filename):
+        points, indices, offsets = load_mesh(filename)
+        if not len(points):
+            raise ValueError("в файле нет вершин")
+        # Сетка переносится в начало координат и масштабируется
+        # до размера буквы "A", чтобы подходили диапазоны слайдеров
+        low, high = points.min(axis=0), points.max(axis=0)
+        size = float((high - low).max()) or 1.0
+        vertices = np.empty((len(points), 4), dtype=np.float32)
+        vertices[:, :3] = (points - (low + high) / 2) * (MESH_FIT_SIZE / size)
+        vertices[:, 3] = 1
+        
+        self.set_mesh(vertices, indices, offsets)
         
     def create_letter_a(self):
-        self.vertices = [
+        vertices = homogeneous([
             [-1, 0, -0.5], [1, 0, -0.5], [1, 3, -0.5], [-1, 3, -0.5],
             [-0.5, 0.5, -0.5], [0.5, 0.5, -0.5], [0.5, 1.5, -0.5], [-0.5, 1.5, -0.5],
             [-1, 0, 0.5], [1, 0, 0.5], [1, 3, 0.5], [-1, 3, 0.5],
             [-0.5, 0.5, 0.5], [0.5, 0.5, 0.5], [0.5, 1.5, 0.5], [-0.5, 1.5, 0.5]
-        ]
-        
-        self.edges = [
-            (0,1),(1,2),(2,3),(3,0),
-            (4,5),(5,6),(6,7),(7,4),
-            (0,4),(1,5),(2,6),(3,7),
-            (8,9),(9,10),(10,11),(11,8),
-            (12,13),(13,14),(14,15),(15,12),
-            (8,12),(9,13),(10,14),(11,15),
-            (0,8),(1,9),(2,10),(3,11),
-            (4,12),(5,13),(6,14),(7,15)
-        ]
+        ])
+        
+        # Грани объёмной рамки: стороны z = -0.5 и z = 0.5 между внешним
+        # и внутренним контуром, внешние и внутренние боковые стороны.
+        # Порядок обхода задаёт внешнюю сторону грани; 32 ребра рамки
+        # получаются из граней
+        faces = []
+        for outer, inner, outward in ((0, 4, False), (8, 12, True)):
+            faces += [(outer + i, outer + (i + 1) % 4, inner + (i + 1) % 4, inner + i)[::1 if outward else -1]
+                      for i in range(4)]
+        for front, back, outward in ((0, 8, True), (4, 12, False)):
+            faces += [(front + i, front + (i + 1) % 4, back + (i + 1) % 4, back + i)[::1 if outward else -1]
+                      for i in range(4)]
+        self.set_mesh(vertices, *faces_from_counts(np.array(faces).reshape(-1), np.full(len(faces), 4)))
 
 class ThreeDWidget(QWidget):
+    transform_changed = Signal()  # Матрица преобразования пересчитана
+    
     def __init__(self):
         super().__init__()
         self.setMinimumSize(600, 600)
         
         self.object_3d = ThreeDObject()
         self.object_3d.create_letter_a()
+        # Сцена из экземпляров объекта; преобразование со слайдеров
+        # применяется ко всей сцене поверх мировых матриц узлов
+        self.scene = grid_scene(self.object_3d, 1, INSTANCE_SPACING)
         
-        self.transform_matrix = np.eye(4)
+        self.transform = TransformState()
+        self.shown_version = None
         self.projection_matrix = np.eye(4)
         
-        self.rotation_x = 0
-        self.rotation_y = 0
-        self.rotation_z = 0
-        self.scale = 1.0
-        self.translation = [0, 0, 0]
-        
         self.projection_type = "perspective"
         self.show_projections = False
-        
+        # Области режима проекций, у каждой своя камера
+        self.viewports = default_viewports()
+        # Режим отрисовки: "wireframe" - рёбра, "flat" и "gouraud" -
+        # заливка граней с удалением невидимых поверхностей
+        self.render_mode = "wireframe"
+        self.rasterizer = Rasterizer()
+        self.backface_culling = True  # Не рисовать нелицевые грани и их рёбра
+        # Выбранный мышью элемент: (сетка, мировая матрица экземпляра,
+        # номер экземпляра, "vertex" / "edge" / "face", номер элемента)
+        self.selection = None
+        
+        # Автоповорот: кадры по времени, вершины следующего кадра
+        # готовятся в потоке пула (prepared)
         self.auto_rotation = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.auto_rotate)
+        self.scheduler = FrameScheduler(self)
+        self.prepared = None
         
         self.setup_matrices()
     
     def setup_matrices(self):
-        self.update_transform_matrix()
         self.update_projection_matrix()
     
-    def update_transform_matrix(self):
-        self.transform_matrix = np.eye(4)
-        
-        translation_matrix = np.array([
-            [1, 0, 0, self.translation[0]],
-            [0, 1, 0, self.translation[1]],
-            [0, 0, 1, self.translation[2]],
-            [0, 0, 0, 1]
-        ])
-        
-        scale_matrix = np.array([
-            [self.scale, 0, 0, 0],
-            [0, self.scale, 0, 0],
-            [0, 0, self.scale, 0],
-            [0, 0, 0, 1]
-        ])
-        
-        rx = math.radians(self.rotation_x)
-        ry = math.radians(self.rotation_y)
-        rz = math.radians(self.rotation_z)
-        
-        rx_matrix = np.array([
-            [1, 0, 0, 0],
-            [0, math.cos(rx), -math.sin(rx), 0],
-            [0, math.sin(rx), math.cos(rx), 0],
-            [0, 0, 0, 1]
-        ])
-        
-        ry_matrix = np.array([
-            [math.cos(ry), 0, math.sin(ry), 0],
-            [0, 1, 0, 0],
-            [-math.sin(ry), 0, math.cos(ry), 0],
-            [0, 0, 0, 1]
-        ])
-        
-        rz_matrix = np.array([
-            [math.cos(rz), -math.sin(rz), 0, 0],
-            [math.sin(rz), math.cos(rz), 0, 0],
-            [0, 0, 1, 0],
-            [0, 0, 0, 1]
-        ])
-        
-        rotation_matrix = rz_matrix @ ry_matrix @ rx_matrix
-        self.transform_matrix = translation_matrix @ rotation_matrix @ scale_matrix
+    @property
+    def transform_matrix(self):
+        return self.transform.model_matrix()
     
     def update_projection_matrix(self):
         if self.projection_type == "perspective":
-            fov = math.radians(45)
             aspect = self.width() / max(self.height(), 1)
-            near = 0.1
-            far = 100.0
-            
-            f = 1.0 / math.tan(fov / 2)
-            self.projection_matrix = np.array([
-                [f/aspect, 0, 0, 0],
-                [0, f, 0, 0],
-                [0, 0, (far+near)/(near-far), (2*far*near)/(near-far)],
-                [0, 0, -1, 0]
-            ])
+            self.projection_matrix = perspective(45, aspect, 0.1, 100.0)
         else:
             left = -2
             right = 2
@@ -137,50 +269,96 @@ class ThreeDWidget(QWidget):
                 [0, 0, 0, 1]
             ])
     
-    def project_point(self, point):
-        point_4d = np.array([point[0], point[1], point[2], 1])
-        transformed = self.transform_matrix @ point_4d
-        projected = self.projection_matrix @ transformed
-        
-        if projected[3] != 0:
-            projected = projected / projected[3]
-        
-        x = (projected[0] + 1) * self.width() / 2
-        y = (1 - projected[1]) * self.height() / 2
-        
-        return (x, y)
+    @perf.timed("project_vertices")
+    def project_vertices(self, vertices, matrices):
+        # Однородные вершины (N, 4) всех K экземпляров сетки переводятся
+        # в пространство отсечения одним пакетным умножением на матрицы
+        # P @ T @ W (K, 4, 4).
+        # Деление на w выполняется после отсечения
+        return transform_instances(vertices, matrices)
     
-    def project_point_orthographic(self, point, plane):
-        point_4d = np.array([point[0], point[1], point[2], 1])
-        transformed = self.transform_matrix @ point_4d
-        
-        if plane == "xy":
-            x = (transformed[0] + 2) * self.width() / 4
-            y = (2 - transformed[1]) * self.height() / 4
-        elif plane == "xz":
-            x = (transformed[0] + 2) * self.width() / 4 + self.width() / 2
-            y = (2 - transformed[2]) * self.height() / 4
-        elif plane == "yz":
-            x = (transformed[1] + 2) * self.width() / 4
-            y = (2 - transformed[2]) * self.height() / 4 + self.height() / 2
-        
-        return (x, y)
+    def clip_to_screen(self, clip):
+        # Экранные координаты точек (N, 4), уже отсечённых пирамидой
+        # видимости: у всех w > 0
+        x = (clip[:, 0] / clip[:, 3] + 1) * self.width() / 2
+        y = (1 - clip[:, 1] / clip[:, 3]) * self.height() / 2
+        return np.column_stack((x, y))
+    
+    def set_perspective_view(self, enabled):
+        self.viewports = default_viewports(enabled)
+        self.update()
     
-    def auto_rotate(self):
-        self.rotation_y += 1
-        if self.rotation_y >= 360:
-            self.rotation_y = 0
-        self.update_transform_matrix()
+    def set_instance_count(self, count):
+        self.scene = grid_scene(self.object_3d, count, INSTANCE_SPACING)
+        self.selection = None
         self.update()
     
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and not self.show_projections:
+            position = event.position()
+            self.selection = self.pick(position.x(), position.y())
+            self.update()
+    
+    @perf.timed("pick")
+    def pick(self, x, y):
+        # Грань под курсором по лучу в системе координат модели, либо её
+        # вершина или ребро рядом с курсором
+        point = [2 * x / self.width() - 1, 1 - 2 * y / self.height()]
+        ends = np.array([point + [-1, 1], point + [1, 1]]).T
+        matrix = self.transform.mvp_matrix(self.projection_matrix)
+        nearest, found = 1.0, None
+        for mesh, world in self.scene.instances():
+            if not len(mesh.triangles):
+                continue
+            rays = np.matmul(np.linalg.inv(matrix @ world), ends)
+            rays = rays[:, :3] / rays[:, 3:]
+            origins, directions = rays[:, :, 0], rays[:, :, 1] - rays[:, :, 0]
+            ray, triangle = np.divmod(mesh.triangle_bvh.ray_candidates(origins, directions),
+                                      len(mesh.triangles))
+            points = mesh.vertices[:, :3]
+            corners = mesh.triangles[triangle]
+            t = ray_triangles(origins[ray], directions[ray], points[corners[:, 0]],
+                              points[corners[:, 1]], points[corners[:, 2]])
+            t[t < 0] = np.inf
+            if len(t) and t.min() <= nearest:
+                hit = np.argmin(t)
+                nearest = t[hit]
+                found = (mesh, world[ray[hit]], int(ray[hit]), mesh.triangle_face[triangle[hit]])
+        if found is None:
+            return None
+        
+        mesh, world, instance, face = found
+        start, end = mesh.face_offsets[face], mesh.face_offsets[face + 1]
+        clip = mesh.vertices[mesh.face_indices[start:end]] @ (matrix @ world).T
+        front = clip[:, 3] > 0
+        screen = self.clip_to_screen(np.where(front[:, None], clip, 1))
+        distance = np.where(front, np.hypot(screen[:, 0] - x, screen[:, 1] - y), np.inf)
+        if distance.min() <= PICK_RADIUS:
+            return (mesh, world, instance, "vertex", int(mesh.face_indices[start + np.argmin(distance)]))
+        
+        # Расстояния от курсора до сторон грани на экране
+        a, b = screen, np.roll(screen, -1, axis=0)
+        ab = b - a
+        length = np.maximum((ab ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((x - a[:, 0]) * ab[:, 0] + (y - a[:, 1]) * ab[:, 1]) / length, 0, 1)
+        distance = np.hypot(a[:, 0] + t * ab[:, 0] - x, a[:, 1] + t * ab[:, 1] - y)
+        distance[~(front & np.roll(front, -1))] = np.inf
+        edge = mesh.face_edge_index[start:end][np.argmin(distance)]
+        if distance.min() <= PICK_RADIUS and edge >= 0:
+            return (mesh, world, instance, "edge", int(edge))
+        return (mesh, world, instance, "face", int(face))
+    
     def toggle_auto_rotation(self):
         self.auto_rotation = not self.auto_rotation
         if self.auto_rotation:
-            self.timer.start(30)
+            self.scheduler.start()
         else:
-            self.timer.stop()
+            self.scheduler.stop()
+            self.prepared = None
     
+    @perf.timed("paintEvent")
     def paintEvent(self, event):
+        self.scheduler.frame_started()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
@@ -190,15 +368,55 @@ class ThreeDWidget(QWidget):
             self.draw_projections(painter)
         else:
             self.draw_main_view(painter)
+        
+        # Подписчики (панель матрицы) обновляются один раз за кадр
+        if self.transform.version != self.shown_version:
+            self.shown_version = self.transform.version
+            self.transform_changed.emit()
+        
+        if perf.enabled:
+            instances = self.scene.instances()
+            perf.count("экземпляров", sum(len(world) for _, world in instances))
+            perf.count("вершин", sum(len(mesh.vertices) * len(world) for mesh, world in instances))
+            perf.count("рёбер", sum(len(mesh.edges) * len(world) for mesh, world in instances))
+            self.draw_hud(painter)
+        
+        if self.auto_rotation:
+            self.draw_frame_rate(painter)
+        self.scheduler.frame_painted()
+    
+    def draw_frame_rate(self, painter):
+        # Частота кадров автоповорота и число пропущенных кадров
+        scheduler = self.scheduler
+        perf.count("FPS", scheduler.fps)
+        perf.count("пропущено кадров", scheduler.dropped)
+        painter.setPen(QPen(QColor(255, 255, 255), 1))
+        painter.setFont(QFont("Monospace", 9))
+        painter.drawText(self.width() - 260, 20, f"FPS: {scheduler.fps:5.1f}  пропущено: {scheduler.dropped}")
+    
+    def draw_hud(self, painter):
+        # Панель замеров в левом нижнем углу: время этапов (последнее,
+        # медиана, 99-й перцентиль) и число примитивов
+        lines = perf.hud_lines()
+        painter.save()
+        painter.setFont(QFont("Monospace", 9))
+        height = painter.fontMetrics().height()
+        top = self.height() - height * len(lines) - 15
+        painter.fillRect(5, top, 460, height * len(lines) + 10, QColor(0, 0, 0, 200))
+        painter.setPen(QColor(255, 255, 0))
+        for i, line in enumerate(lines):
+            painter.drawText(10, top + height * (i + 1), line)
+        painter.restore()
     
     def draw_main_view(self, painter):
         pen = QPen(QColor(255, 255, 255), 1)
         painter.setPen(pen)
         
         painter.drawText(10, 20, "3D View")
-        painter.drawText(10, 40, f"Rotation: X={self.rotation_x}° Y={self.rotation_y}° Z={self.rotation_z}°")
-        painter.drawText(10, 60, f"Scale: {self.scale:.2f}")
-        painter.drawText(10, 80, f"Translation: ({self.translation[0]:.1f}, {self.translation[1]:.1f}, {self.translation[2]:.1f})")
+        rotation, translation = self.transform.rotation, self.transform.translation
+        painter.drawText(10, 40, f"Rotation: X={rotation[0]}° Y={rotation[1]}° Z={rotation[2]}°")
+        painter.drawText(10, 60, f"Scale: {self.transform.scale:.2f}")
+        painter.drawText(10, 80, f"Translation: ({translation[0]:.1f}, {translation[1]:.1f}, {translation[2]:.1f})")
         
         center_x = self.width() / 2
         center_y = self.height() / 2
@@ -211,51 +429,151 @@ class ThreeDWidget(QWidget):
         pen = QPen(QColor(255, 255, 255), 2)
         painter.setPen(pen)
         
-        for edge in self.object_3d.edges:
-            v1 = self.object_3d.vertices[edge[0]]
-            v2 = self.object_3d.vertices[edge[1]]
-            
-            p1 = self.project_point(v1)
-            p2 = self.project_point(v2)
-            
-            painter.drawLine(int(p1[0]), int(p1[1]), int(p2[0]), int(p2[1]))
+        # Матрица P @ T берётся из кэша и пересчитывается только после
+        # изменения преобразования или проекции, мировые матрицы W узлов
+        # сцены - после изменения узлов. Все экземпляры одной сетки
+        # проецируются вместе, каждая вершина - один раз
+        matrix = self.transform.mvp_matrix(self.projection_matrix)
+        instances = self.project_instances(matrix)
+        
+        surface = self.render_mode != "wireframe"
+        if surface:
+            self.rasterizer.resize(self.width(), self.height())
+            self.rasterizer.clear()
+            drawn = sum(self.draw_surface(mesh, world, matrices, clip)
+                        for mesh, world, matrices, clip in instances if len(mesh.triangles))
+            painter.drawImage(0, 0, self.rasterizer.image)
+            perf.count("треугольников", drawn)
+        
+        # Рёбра, параллелепипеды которых вне пирамиды видимости, отбрасываются
+        # по иерархии, остальные отсекаются пирамидой до деления на w.
+        # У сетки с гранями рисуются только рёбра лицевых граней. Сетки
+        # без граней рисуются каркасом и при заливке
+        drawn = 0
+        for mesh, world, matrices, clip in instances:
+            if surface and len(mesh.triangles):
+                continue
+            index = mesh.edge_bvh.cull(np.matmul(FRUSTUM_PLANES, matrices))
+            if self.backface_culling and len(mesh.triangles):
+                index = index[self.front_edges(mesh, clip, len(world))[index]]
+            segments = clip_edges(clip, instance_primitives(mesh.edges, index, len(mesh.vertices)))
+            draw_line_array(painter, self.clip_to_screen(segments.reshape(-1, 4)).reshape(-1, 4))
+            drawn += len(segments)
+        perf.count("рёбер нарисовано", drawn)
+        
+        self.draw_selection(painter, matrix)
+    
+    def project_instances(self, matrix):
+        # Экземпляры сцены в пространстве отсечения: (сетка, мировые матрицы,
+        # матрицы P @ T @ W, вершины). Буфер, подготовленный планировщиком
+        # в потоке пула для этого кадра, используется без пересчёта; буфер
+        # следующего кадра может быть готов раньше текущего и сохраняется
+        prepared = self.prepared
+        if prepared is not None and prepared.matches(self.scene, matrix):
+            self.prepared = None
+            perf.count("кадр подготовлен заранее", 1)
+            return prepared.instances
+        perf.count("кадр подготовлен заранее", 0)
+        instances = []
+        for mesh, world in self.scene.instances():
+            matrices = matrix @ world
+            instances.append((mesh, world, matrices, self.project_vertices(mesh.vertices, matrices)))
+        return instances
+    
+    def draw_selection(self, painter, matrix):
+        # Выбранные вершина, ребро или контур грани поверх изображения
+        if self.selection is None:
+            return
+        mesh, world, instance, kind, index = self.selection
+        if kind == "vertex":
+            vertices = np.array([index])
+        elif kind == "edge":
+            vertices = mesh.edges[index]
+        else:
+            vertices = mesh.face_indices[mesh.face_offsets[index]:mesh.face_offsets[index + 1]]
+        clip = mesh.vertices[vertices] @ (matrix @ world).T
+        
+        painter.setPen(QPen(QColor(255, 220, 0), 3))
+        if kind == "vertex":
+            if plane_distances(clip).min() >= 0:
+                x, y = self.clip_to_screen(clip)[0]
+                painter.drawEllipse(QPointF(x, y), 5, 5)
+        else:
+            sides = np.arange(len(vertices))
+            sides = np.column_stack((sides, np.roll(sides, -1)))[:1 if kind == "edge" else None]
+            segments = clip_edges(clip, sides)
+            draw_line_array(painter, self.clip_to_screen(segments.reshape(-1, 4)).reshape(-1, 4))
+        painter.setPen(QPen(QColor(255, 255, 255), 1))
+        painter.drawText(10, 100, f"Выбрано: {SELECTION_NAMES[kind]} {index} (экземпляр {instance})")
+    
+    def front_edges(self, mesh, clip, count):
+        # Маска рёбер count экземпляров сетки, прилегающих хотя бы к одной
+        # лицевой грани своего экземпляра. Ориентация грани определяется
+        # по первым трём вершинам (грани плоские)
+        counts = np.diff(mesh.face_offsets)
+        polygons = counts >= 3
+        starts = mesh.face_offsets[:-1][polygons]
+        corners = mesh.face_indices[np.column_stack((starts, starts + 1, starts + 2))]
+        front = np.zeros((count, len(counts)), dtype=bool)
+        corners = instance_indices(corners, count, len(mesh.vertices))
+        front[:, polygons] = front_facing(clip, corners).reshape(count, -1)
+        
+        visible = np.zeros((count, len(mesh.edges)), dtype=bool)
+        instance, position = np.nonzero(np.repeat(front, counts, axis=1) & (mesh.face_edge_index >= 0))
+        visible[instance, mesh.face_edge_index[position]] = True
+        return visible.reshape(-1)
+    
+    def draw_surface(self, mesh, world, matrices, clip):
+        # Растеризация граней всех экземпляров; возвращает число треугольников
+        index = mesh.triangle_bvh.cull(np.matmul(FRUSTUM_PLANES, matrices))
+        triangles = instance_primitives(mesh.triangles, index, len(mesh.vertices))
+        distances = plane_distances(clip)
+        keep = inside_frustum(outcodes(distances), triangles)
+        if self.backface_culling:
+            keep &= front_facing(clip, triangles)
+        index, triangles = index[keep], triangles[keep]
+        
+        model = self.transform.model_matrix() @ world
+        normal_matrices = np.linalg.inv(model[:, :3, :3]).transpose(0, 2, 1)
+        if self.render_mode == "flat":
+            clip, triangles, _, source = clip_triangles_near(
+                clip, distances[:, NEAR_PLANE], triangles)
+            colors = pack_colors(lighting(instance_normals(mesh.face_normals, normal_matrices, index[source])))
+        else:
+            normals = np.matmul(mesh.vertex_normals, normal_matrices.transpose(0, 2, 1))
+            colors = lighting(normals.reshape(-1, 3))
+            clip, triangles, colors, _ = clip_triangles_near(
+                clip, distances[:, NEAR_PLANE], triangles, colors)
+        
+        return self.rasterizer.draw_triangles(clip, triangles, colors)
     
     def draw_projections(self, painter):
+        painter.setPen(QPen(QColor(255, 255, 255), 1))
         painter.drawText(10, 20, "Orthographic Projections")
         
-        pen = QPen(QColor(100, 100, 150), 1)
-        painter.setPen(pen)
-        
-        painter.drawLine(self.width()//2, 0, self.width()//2, self.height())
-        painter.drawLine(0, self.height()//2, self.width(), self.height()//2)
+        # Вершины всех экземпляров переводятся в мировые координаты один раз
+        # за кадр; области отличаются только камерой: ортографические виды
+        # выбирают два столбца координат, перспективный умножает на P @ V
+        geometry = [(transform_instances(mesh.vertices, self.transform_matrix @ world),
+                     instance_indices(mesh.edges, len(world), len(mesh.vertices)))
+                    for mesh, world in self.scene.instances()]
         
-        pen = QPen(QColor(255, 100, 100), 2)
-        painter.setPen(pen)
-        
-        for edge in self.object_3d.edges:
-            v1 = self.object_3d.vertices[edge[0]]
-            v2 = self.object_3d.vertices[edge[1]]
-            
-            p1_xy = self.project_point_orthographic(v1, "xy")
-            p2_xy = self.project_point_orthographic(v2, "xy")
-            painter.drawLine(int(p1_xy[0]), int(p1_xy[1]), int(p2_xy[0]), int(p2_xy[1]))
+        font = QFont("Arial", 12, QFont.Bold)
+        for viewport in self.viewports:
+            rect = viewport.pixel_rect(self.width(), self.height())
+            painter.save()
+            painter.setPen(QPen(QColor(100, 100, 150), 1))
+            painter.drawRect(QRectF(*rect))
+            painter.setClipRect(QRectF(*rect))
             
-            p1_xz = self.project_point_orthographic(v1, "xz")
-            p2_xz = self.project_point_orthographic(v2, "xz")
-            painter.drawLine(int(p1_xz[0]), int(p1_xz[1]), int(p2_xz[0]), int(p2_xz[1]))
+            painter.setPen(QPen(QColor(255, 100, 100), 2))
+            for points, edges in geometry:
+                draw_line_array(painter, viewport.camera.project(points, edges, rect))
             
-            p1_yz = self.project_point_orthographic(v1, "yz")
-            p2_yz = self.project_point_orthographic(v2, "yz")
-            painter.drawLine(int(p1_yz[0]), int(p1_yz[1]), int(p2_yz[0]), int(p2_yz[1]))
-        
-        font = QFont("Arial", 12, QFont.Bold)
-        painter.setFont(font)
-        pen = QPen(QColor(200, 200, 255), 1)
-        painter.setPen(pen)
-        
-        painter.drawText(self.width()//4 - 30, 30, "XY Plane")
-        painter.drawText(3*self.width()//4 - 30, 30, "XZ Plane")
-        painter.drawText(self.width()//4 - 30, self.height()//2 + 30, "YZ Plane")
+            painter.setFont(font)
+            painter.setPen(QPen(QColor(200, 200, 255), 1))
+            painter.drawText(QPointF(rect[0] + rect[2] / 2 - 30, rect[1] + 30), viewport.name)
+            painter.restore()
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -269,6 +587,7 @@ class MainWindow(QMainWindow):
         main_layout = QHBoxLayout(central_widget)
         
         self.view_3d = ThreeDWidget()
+        self.view_3d.transform_changed.connect(self.update_matrix_display)
         
         control_panel = QWidget()
         control_panel.setFixedWidth(300)
@@ -280,6 +599,8 @@ class MainWindow(QMainWindow):
         
         control_layout.addWidget(self.create_transform_group())
         control_layout.addWidget(self.create_projection_group())
+        control_layout.addWidget(self.create_render_group())
+        control_layout.addWidget(self.create_scene_group())
         control_layout.addWidget(self.create_matrix_group())
         control_layout.addWidget(self.create_control_group())
         
@@ -358,9 +679,50 @@ class MainWindow(QMainWindow):
         self.projections_checkbox = QRadioButton("Показать 3 проекции")
         self.projections_checkbox.toggled.connect(self.toggle_projections)
         
+        self.perspective_view_checkbox = QCheckBox("Перспективный вид в 4-й области")
+        self.perspective_view_checkbox.toggled.connect(self.view_3d.set_perspective_view)
+        
         layout.addWidget(self.perspective_radio)
         layout.addWidget(self.orthographic_radio)
         layout.addWidget(self.projections_checkbox)
+        layout.addWidget(self.perspective_view_checkbox)
+        
+        group.setLayout(layout)
+        return group
+    
+    def create_render_group(self):
+        group = QGroupBox("Отрисовка")
+        layout = QVBoxLayout()
+        
+        self.render_radios = {
+            "wireframe": QRadioButton("Каркас"),
+            "flat": QRadioButton("Плоская заливка"),
+            "gouraud": QRadioButton("Заливка по Гуро"),
+        }
+        self.render_radios["wireframe"].setChecked(True)
+        for radio in self.render_radios.values():
+            radio.toggled.connect(self.update_render_mode)
+            layout.addWidget(radio)
+        
+        self.backface_checkbox = QCheckBox("Отсекать нелицевые грани")
+        self.backface_checkbox.setChecked(self.view_3d.backface_culling)
+        self.backface_checkbox.toggled.connect(self.toggle_backface_culling)
+        layout.addWidget(self.backface_checkbox)
+        
+        group.setLayout(layout)
+        return group
+    
+    def create_scene_group(self):
+        group = QGroupBox("Сцена")
+        layout = QHBoxLayout()
+        
+        self.instances_spinbox = QSpinBox()
+        self.instances_spinbox.setRange(1, MAX_INSTANCES)
+        self.instances_spinbox.setValue(1)
+        self.instances_spinbox.valueChanged.connect(self.view_3d.set_instance_count)
+        
+        layout.addWidget(QLabel("Экземпляров:"))
+        layout.addWidget(self.instances_spinbox)
         
         group.setLayout(layout)
         return group
@@ -388,53 +750,58 @@ class MainWindow(QMainWindow):
         self.auto_rotation_button = QPushButton("Вкл/Выкл автоповорот")
         self.auto_rotation_button.clicked.connect(self.view_3d.toggle_auto_rotation)
         
+        self.perf_checkbox = QCheckBox("Замеры")
+        self.perf_checkbox.setChecked(perf.enabled)
+        self.perf_checkbox.toggled.connect(self.toggle_perf)
+        
+        self.trace_button = QPushButton("Сохранить трассу")
+        self.trace_button.clicked.connect(self.save_trace)
+        
+        self.open_button = QPushButton("Открыть модель (OBJ, PLY)")
+        self.open_button.clicked.connect(self.open_mesh)
+        
+        layout.addWidget(self.open_button)
         layout.addWidget(self.reset_button)
         layout.addWidget(self.auto_rotation_button)
+        layout.addWidget(self.perf_checkbox)
+        layout.addWidget(self.trace_button)
         
         group.setLayout(layout)
         return group
     
+    def closeEvent(self, event):
+        # Подготовка кадра в потоке пула завершается до закрытия окна
+        self.view_3d.scheduler.stop()
+        QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
+    
     def update_rotation_x(self, value):
-        self.view_3d.rotation_x = value
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_rotation(0, value)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_rotation_y(self, value):
-        self.view_3d.rotation_y = value
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_rotation(1, value)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_rotation_z(self, value):
-        self.view_3d.rotation_z = value
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_rotation(2, value)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_scale(self, value):
-        self.view_3d.scale = value / 100.0
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_scale(value / 100.0)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_translation_x(self, value):
-        self.view_3d.translation[0] = value / 50.0
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_translation(0, value / 50.0)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_translation_y(self, value):
-        self.view_3d.translation[1] = value / 50.0
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_translation(1, value / 50.0)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_translation_z(self, value):
-        self.view_3d.translation[2] = value / 50.0
-        self.view_3d.update_transform_matrix()
+        self.view_3d.transform.set_translation(2, value / 50.0)
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_projection_type(self):
         if self.perspective_radio.isChecked():
@@ -444,16 +811,50 @@ class MainWindow(QMainWindow):
         self.view_3d.update_projection_matrix()
         self.view_3d.update()
     
+    def update_render_mode(self):
+        for mode, radio in self.render_radios.items():
+            if radio.isChecked():
+                self.view_3d.render_mode = mode
+        self.view_3d.update()
+    
+    def toggle_backface_culling(self, checked):
+        self.view_3d.backface_culling = checked
+        self.view_3d.update()
+    
     def toggle_projections(self, checked):
         self.view_3d.show_projections = checked
         self.view_3d.update()
     
+    def toggle_perf(self, checked):
+        perf.enabled = checked
+        if checked:
+            perf.clear()
+        self.view_3d.update()
+    
+    def open_mesh(self):
+        filename, _ = QFileDialog.getOpenFileName(
+            self, "Открыть модель", "", "Mesh Files (*.obj *.ply);;All Files (*)"
+        )
+        if not filename:
+            return
+        try:
+            self.view_3d.object_3d.load_mesh(filename)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки модели: {e}")
+            QMessageBox.warning(self, "Ошибка", "Не удалось загрузить модель")
+            return
+        self.view_3d.selection = None
+        self.view_3d.update()
+    
+    def save_trace(self):
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить трассу", "trace.json", "Trace Files (*.json)"
+        )
+        if filename:
+            perf.dump_trace(filename)
+    
     def reset_transforms(self):
-        self.view_3d.rotation_x = 0
-        self.view_3d.rotation_y = 0
-        self.view_3d.rotation_z = 0
-        self.view_3d.scale = 1.0
-        self.view_3d.translation = [0, 0, 0]
+        self.view_3d.transform.reset()
         
         self.rotation_x_slider.setValue(0)
         self.rotation_y_slider.setValue(0)
@@ -463,9 +864,7 @@ class MainWindow(QMainWindow):
         self.translate_y_slider.setValue(0)
         self.translate_z_slider.setValue(0)
         
-        self.view_3d.update_transform_matrix()
         self.view_3d.update()
-        self.update_matrix_display()
     
     def update_matrix_display(self):
         matrix = self.view_3d.transform_matrix
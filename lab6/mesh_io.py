@@ -0,0 +1,309 @@
+import os
+import re
+
+import numpy as np
+
+MESH_CACHE_VERSION = 1  # Версия устройства файла кэша .npz
+
+# Типы свойств PLY и соответствующие им типы NumPy
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+PLY_ENDIAN = {"binary_little_endian": "<", "binary_big_endian": ">", "ascii": None}
+PLY_FACE_PROPERTIES = ("vertex_indices", "vertex_index")
+
+# Грани хранятся так же, как ломаные в lab5: общий массив номеров вершин
+# и массив смещений длины F + 1, грань i - indices[offsets[i]:offsets[i + 1]]
+
+def empty_faces():
+    return np.empty(0, dtype=np.int32), np.zeros(1, dtype=np.int64)
+
+def faces_from_counts(indices, counts):
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    if offsets[-1] != len(indices):
+        raise ValueError("число номеров вершин не совпадает с размерами граней")
+    return np.ascontiguousarray(indices, dtype=np.int32), offsets
+
+def check_indices(indices, n):
+    if len(indices) and (indices.min() < 0 or indices.max() >= n):
+        raise ValueError("номер вершины грани вне диапазона")
+
+def face_edges(indices, offsets, return_inverse=False):
+    # Уникальные рёбра граней (E, 2); return_inverse - также номер ребра
+    # от каждой вершины грани к следующей (-1 для вырожденных)
+    counts = np.diff(offsets)
+    if not len(indices):
+        edges = np.empty((0, 2), dtype=np.int32)
+        return (edges, np.empty(0, dtype=np.int32)) if return_inverse else edges
+    following = np.arange(1, len(indices) + 1)
+    following[offsets[1:][counts > 0] - 1] = offsets[:-1][counts > 0]
+    a = indices.astype(np.int64)
+    b = a[following]
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    keep = lo != hi
+    n = int(hi.max()) + 1
+    keys = lo[keep] * n + hi[keep]
+    if return_inverse:
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+    else:
+        keys = np.sort(keys)
+    new = np.concatenate(([True], keys[1:] != keys[:-1]))
+    keys = keys[new]
+    edges = np.column_stack((keys // n, keys % n)).astype(np.int32)
+    if not return_inverse:
+        return edges
+    inverse = np.full(len(indices), -1, dtype=np.int32)
+    inverse[np.flatnonzero(keep)[order]] = np.cumsum(new) - 1
+    return edges, inverse
+
+def triangulate(indices, offsets):
+    # Разбиение граней веером из первой вершины на треугольники (T, 3)
+    counts = np.diff(offsets)
+    triangles = np.maximum(counts - 2, 0)
+    if not triangles.sum():
+        return np.empty((0, 3), dtype=np.int32)
+    face = np.repeat(np.arange(len(counts)), triangles)
+    # Номер треугольника внутри своей грани
+    local = np.arange(len(face)) - np.repeat(np.cumsum(triangles) - triangles, triangles)
+    first = offsets[:-1][face]
+    return np.column_stack((indices[first], indices[first + local + 1],
+                            indices[first + local + 2])).astype(np.int32)
+
+def load_obj(filename):
+    # Разбираются только вершины "v x y z [w]" и грани "f i/t/n ...";
+    # номера вершин в OBJ начинаются с 1, отрицательные отсчитываются
+    # от последней объявленной вершины
+    with open(filename, 'rb') as f:
+        lines = f.read().splitlines()
+
+    coords = []
+    tokens = []
+    counts = []
+    bases = []
+    for line in lines:
+        if line.startswith((b'v ', b'v\t')):
+            parts = line.split()
+            if len(parts) < 4:
+                raise ValueError(f"неполная вершина: {line.decode(errors='replace')}")
+            coords.extend(parts[1:4])
+        elif line.startswith((b'f ', b'f\t')):
+            parts = line.split()[1:]
+            counts.append(len(parts))
+            bases.append(len(coords) // 3)
+            tokens.extend(parts)
+
+    vertices = np.array(coords, dtype=np.float64).astype(np.float32).reshape(-1, 3)
+    if not tokens:
+        return (vertices,) + empty_faces()
+    # Номера текстурных координат и нормалей после '/' отбрасываются
+    indices = np.array(re.sub(rb'/\S*', b'', b' '.join(tokens)).split(), dtype=np.int64)
+    counts = np.array(counts)
+    indices = np.where(indices < 0, indices + np.repeat(bases, counts), indices - 1)
+    check_indices(indices, len(vertices))
+    return (vertices,) + faces_from_counts(indices, counts)
+
+def ply_type(name):
+    if name not in PLY_TYPES:
+        raise ValueError(f"неизвестный тип свойства PLY: {name}")
+    return PLY_TYPES[name]
+
+def read_ply_header(f):
+    if f.readline().strip() != b'ply':
+        raise ValueError("файл не в формате PLY")
+    endian = None
+    elements = []  # (имя, число, [(свойство, тип, тип счётчика списка или None)])
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("заголовок PLY не завершён")
+        parts = line.decode('ascii', errors='replace').split()
+        if not parts or parts[0] in ("comment", "obj_info"):
+            continue
+        if parts[0] == "end_header":
+            break
+        if parts[0] == "format":
+            if len(parts) < 2 or parts[1] not in PLY_ENDIAN:
+                raise ValueError(f"неподдерживаемый формат PLY: {' '.join(parts[1:])}")
+            endian = PLY_ENDIAN[parts[1]]
+        elif parts[0] == "element":
+            if len(parts) != 3 or not parts[2].isdigit():
+                raise ValueError(f"неверное описание элемента PLY: {' '.join(parts)}")
+            elements.append((parts[1], int(parts[2]), []))
+        elif parts[0] == "property":
+            if not elements:
+                raise ValueError("свойство PLY до описания элемента")
+            if len(parts) != (5 if parts[1:2] == ["list"] else 3):
+                raise ValueError(f"неверное описание свойства PLY: {' '.join(parts)}")
+            if parts[1] == "list":
+                elements[-1][2].append((parts[4], ply_type(parts[3]), ply_type(parts[2])))
+            else:
+                elements[-1][2].append((parts[2], ply_type(parts[1]), None))
+    return endian, elements
+
+def read_ply_binary(data, offset, count, properties, endian):
+    # Чтение элемента двоичного PLY. Элемент без списков и элемент,
+    # у которого все списки одной длины (например, только треугольники),
+    # читаются одним np.frombuffer; иначе строки разбираются по очереди.
+    # Списки возвращаются парой (значения подряд, длины)
+    def layout(lengths):
+        fields = []
+        for (name, kind, count_kind), length in zip(properties, lengths):
+            if count_kind is None:
+                fields.append((name, endian + kind))
+            else:
+                fields.append((name + "#", endian + count_kind))
+                fields.append((name, endian + kind, (length,)))
+        return np.dtype(fields)
+
+    # Длины списков определяются по первой строке
+    lengths = []
+    position = offset
+    for name, kind, count_kind in properties:
+        if count_kind is None:
+            lengths.append(0)
+            position += np.dtype(kind).itemsize
+        else:
+            length = int(np.frombuffer(data, endian + count_kind, 1, position)[0]) if count else 0
+            lengths.append(length)
+            position += np.dtype(count_kind).itemsize + length * np.dtype(kind).itemsize
+
+    dtype = layout(lengths)
+    if offset + count * dtype.itemsize <= len(data):
+        rows = np.frombuffer(data, dtype, count, offset)
+        uniform = all(count_kind is None or (rows[name + "#"] == length).all()
+                      for (name, _, count_kind), length in zip(properties, lengths))
+        if uniform:
+            values = {}
+            for (name, _, count_kind), length in zip(properties, lengths):
+                if count_kind is None:
+                    values[name] = rows[name]
+                else:
+                    values[name] = (rows[name].reshape(-1), np.full(count, length))
+            return values, offset + count * dtype.itemsize
+
+    values = {name: ([], []) if count_kind else [] for name, _, count_kind in properties}
+    for _ in range(count):
+        for name, kind, count_kind in properties:
+            if count_kind is None:
+                values[name].append(np.frombuffer(data, endian + kind, 1, offset)[0])
+                offset += np.dtype(kind).itemsize
+            else:
+                length = int(np.frombuffer(data, endian + count_kind, 1, offset)[0])
+                offset += np.dtype(count_kind).itemsize
+                values[name][0].append(np.frombuffer(data, endian + kind, length, offset))
+                values[name][1].append(length)
+                offset += length * np.dtype(kind).itemsize
+    for name, kind, count_kind in properties:
+        if count_kind is None:
+            values[name] = np.array(values[name], dtype=kind)
+        else:
+            chunks, lengths = values[name]
+            values[name] = (np.concatenate(chunks) if chunks else np.empty(0, kind),
+                            np.array(lengths))
+    return values, offset
+
+def read_ply_ascii(lines, count, properties):
+    if not any(count_kind for _, _, count_kind in properties):
+        table = np.array(b' '.join(lines).split(), dtype=np.float64).reshape(count, -1)
+        return {name: table[:, i] for i, (name, _, _) in enumerate(properties)}
+    if len(lines) < count:
+        raise ValueError("файл PLY содержит меньше строк, чем указано в заголовке")
+    values = {name: ([], []) if count_kind else [] for name, _, count_kind in properties}
+    for line in lines:
+        parts = line.split()
+        position = 0
+        for name, _, count_kind in properties:
+            # Значений в строке меньше, чем требуют свойства или счётчик списка
+            if position >= len(parts):
+                raise ValueError(f"неполная строка PLY: {line.decode(errors='replace')}")
+            if count_kind is None:
+                values[name].append(parts[position])
+                position += 1
+            else:
+                length = int(parts[position])
+                if position + 1 + length > len(parts):
+                    raise ValueError(f"неполная строка PLY: {line.decode(errors='replace')}")
+                values[name][0].extend(parts[position + 1:position + 1 + length])
+                values[name][1].append(length)
+                position += 1 + length
+    for name, kind, count_kind in properties:
+        if count_kind is None:
+            values[name] = np.array(values[name], dtype=np.float64)
+        else:
+            tokens, lengths = values[name]
+            values[name] = (np.array(tokens, dtype=np.int64), np.array(lengths))
+    return values
+
+def load_ply(filename):
+    with open(filename, 'rb') as f:
+        endian, elements = read_ply_header(f)
+        data = f.read()
+
+    found = {}
+    if endian is None:
+        lines = data.splitlines()
+        position = 0
+        for name, count, properties in elements:
+            found[name] = read_ply_ascii(lines[position:position + count], count, properties)
+            position += count
+            if "vertex" in found and "face" in found:
+                break
+    else:
+        offset = 0
+        for name, count, properties in elements:
+            found[name], offset = read_ply_binary(data, offset, count, properties, endian)
+            if "vertex" in found and "face" in found:
+                break
+
+    vertex = found.get("vertex")
+    if vertex is None or not all(axis in vertex for axis in "xyz"):
+        raise ValueError("в файле PLY нет координат вершин")
+    vertices = np.column_stack([vertex[axis] for axis in "xyz"]).astype(np.float32)
+
+    face = found.get("face", {})
+    for name in PLY_FACE_PROPERTIES:
+        if name in face:
+            indices, counts = face[name]
+            check_indices(indices, len(vertices))
+            return (vertices,) + faces_from_counts(indices, counts)
+    return (vertices,) + empty_faces()
+
+MESH_LOADERS = {
+    ".obj": load_obj,
+    ".ply": load_ply,
+}
+
+def cache_path(filename):
+    return filename + ".npz"
+
+def load_mesh(filename, cache=True):
+    # Загрузка сетки: вершины (N, 3) float32, номера вершин граней int32
+    # и смещения граней. Разобранные массивы сохраняются рядом с файлом
+    # в .npz; при повторной загрузке неизменённого файла разбор пропускается
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in MESH_LOADERS:
+        raise ValueError(f"неподдерживаемый формат сетки: {extension}")
+    stat = os.stat(filename)
+    stamp = np.array([MESH_CACHE_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    if cache and os.path.exists(cache_path(filename)):
+        try:
+            with np.load(cache_path(filename)) as cached:
+                if np.array_equal(cached["stamp"], stamp):
+                    return cached["vertices"], cached["indices"], cached["offsets"]
+        except (OSError, KeyError, ValueError):
+            pass
+
+    vertices, indices, offsets = MESH_LOADERS[extension](filename)
+    if cache:
+        try:
+            with open(cache_path(filename), 'wb') as f:
+                np.savez(f, stamp=stamp, vertices=vertices, indices=indices, offsets=offsets)
+        except OSError:
+            # Каталог только для чтения: сетка работает и без кэша
+            pass
+    return vertices, indices, offsets
@@ -0,0 +1,175 @@
+import numpy as np
+from PySide6.QtGui import QImage
+
+from perf import perf
+
+RASTER_FRAGMENTS = 1 << 21  # Число пикселей-кандидатов, обрабатываемых за раз
+RASTER_MIN_W = 1e-6  # Треугольники с вершинами при w меньше этого значения не рисуются
+LIGHT_DIRECTION = np.array([0.4, 0.6, 1.0]) / np.linalg.norm([0.4, 0.6, 1.0])
+LIGHT_AMBIENT = 0.2  # Доля фонового освещения
+SURFACE_COLOR = (120, 170, 255)  # Цвет поверхности при полном освещении
+
+def image_array(image):
+    # Массив (H, W) uint32 поверх памяти QImage: запись сразу меняет изображение
+    pixels = np.frombuffer(image.bits(), dtype=np.uint32)
+    return pixels.reshape(image.height(), image.width())
+
+def pack_colors(rgb):
+    # Цвета (..., 3) в диапазоне 0..255 в пиксели 0xFFRRGGBB
+    rgb = np.clip(rgb, 0, 255).astype(np.uint32)
+    return 0xFF000000 | (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+def face_normals(points, triangles):
+    # Нормали треугольников (T, 3), длина равна удвоенной площади
+    a, b, c = points[triangles[:, 0]], points[triangles[:, 1]], points[triangles[:, 2]]
+    return np.cross(b - a, c - a)
+
+def vertex_normals(points, triangles):
+    # Нормали вершин - суммы нормалей прилегающих треугольников
+    normals = face_normals(points, triangles)
+    indices = triangles.reshape(-1)
+    result = np.column_stack([
+        np.bincount(indices, np.repeat(normals[:, axis], 3), minlength=len(points))
+        for axis in range(3)
+    ])
+    return normalize(result)
+
+def normalize(vectors):
+    length = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(length > 0, length, 1)
+
+def lighting(normals, color=SURFACE_COLOR):
+    # Освещение по Ламберту с двух сторон: порядок обхода граней в файлах бывает разным
+    diffuse = np.abs(normalize(normals) @ LIGHT_DIRECTION)
+    return np.multiply.outer(LIGHT_AMBIENT + (1 - LIGHT_AMBIENT) * diffuse, color)
+
+class Rasterizer:
+    # Построчная растеризация треугольников с буфером глубины, все строки сразу
+    def __init__(self):
+        self.image = None
+        self.pixels = None
+        self.depth = None
+
+    def resize(self, width, height):
+        if self.image is not None and (self.image.width(), self.image.height()) == (width, height):
+            return
+        self.image = QImage(max(width, 1), max(height, 1), QImage.Format_ARGB32_Premultiplied)
+        self.pixels = image_array(self.image)
+        self.depth = np.empty(self.pixels.shape, dtype=np.float32)
+
+    def clear(self):
+        # Пустые пиксели прозрачны: изображение рисуется поверх осей
+        self.pixels.fill(0)
+        self.depth.fill(np.inf)
+
+    @perf.timed("rasterize")
+    def draw_triangles(self, clip, triangles, colors):
+        # colors - пиксели граней (T,) или цвета вершин (N, 3) для заливки по Гуро
+        height, width = self.depth.shape
+        gouraud = colors.ndim == 2
+        w = clip[:, 3]
+        w_safe = np.where(w > RASTER_MIN_W, w, 1)
+        x = (clip[:, 0] / w_safe + 1) * width / 2
+        y = (1 - clip[:, 1] / w_safe) * height / 2
+        z = clip[:, 2] / w_safe
+
+        i0, i1, i2 = triangles.T
+        x0, x1, x2 = x[i0], x[i1], x[i2]
+        y0, y1, y2 = y[i0], y[i1], y[i2]
+        # Строки и столбцы, центры пикселей которых лежат в пределах треугольника
+        top = np.maximum(np.ceil(np.minimum(np.minimum(y0, y1), y2) - 0.5), 0)
+        bottom = np.minimum(np.floor(np.maximum(np.maximum(y0, y1), y2) - 0.5), height - 1)
+        left = np.maximum(np.ceil(np.minimum(np.minimum(x0, x1), x2) - 0.5), 0)
+        right = np.minimum(np.floor(np.maximum(np.maximum(x0, x1), x2) - 0.5), width - 1)
+        denom = (y1 - y2) * (x0 - x2) + (x2 - x1) * (y0 - y2)
+        keep = (top <= bottom) & (left <= right) & (denom != 0) & \
+               (w[i0] > RASTER_MIN_W) & (w[i1] > RASTER_MIN_W) & (w[i2] > RASTER_MIN_W)
+        index = np.flatnonzero(keep)
+        x0, x1, x2, y0, y1, y2, denom = (v[keep] for v in (x0, x1, x2, y0, y1, y2, denom))
+        top, bottom, left, right = top[keep], bottom[keep], left[keep], right[keep]
+        corners = triangles[index]
+
+        # Барицентрические координаты l = a * x + b * y + c
+        a = [(y1 - y2) / denom, (y2 - y0) / denom]
+        b = [(x2 - x1) / denom, (x0 - x2) / denom]
+        c = [-a[0] * x2 - b[0] * y2, -a[1] * x2 - b[1] * y2]
+        a.append(-a[0] - a[1])
+        b.append(-b[0] - b[1])
+        c.append(1 - c[0] - c[1])
+        zc = [z[corners[:, k]] for k in range(3)]
+        depth_plane = [v[0] * zc[0] + v[1] * zc[1] + v[2] * zc[2] for v in (a, b, c)]
+        if gouraud:
+            cc = [colors[corners[:, k]] for k in range(3)]
+            color_plane = [v[0][:, None] * cc[0] + v[1][:, None] * cc[1] + v[2][:, None] * cc[2]
+                           for v in (a, b, c)]
+
+        # Границы строки cy: x = p * cy + q (a > 0 - левая, a < 0 - правая)
+        lower, upper = [], []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for k in range(3):
+                p, q = -b[k] / a[k], -c[k] / a[k]
+                lower.append((np.where(a[k] > 0, p, 0), np.where(a[k] > 0, q, -np.inf)))
+                upper.append((np.where(a[k] < 0, p, 0), np.where(a[k] < 0, q, np.inf)))
+
+        # Все строки всех треугольников
+        rows = (bottom - top + 1).astype(np.int64)
+        cy = np.arange(rows.sum()) - np.repeat(np.cumsum(rows) - rows - top, rows) + 0.5
+        low = np.full(len(cy), -np.inf)
+        high = np.full(len(cy), np.inf)
+        for (p_low, q_low), (p_high, q_high) in zip(lower, upper):
+            low = np.maximum(low, np.repeat(p_low, rows) * cy + np.repeat(q_low, rows))
+            high = np.minimum(high, np.repeat(p_high, rows) * cy + np.repeat(q_high, rows))
+        first = np.maximum(np.ceil(low - 0.5), np.repeat(left, rows))
+        last = np.minimum(np.floor(high - 0.5), np.repeat(right, rows))
+        spans = last >= first
+
+        # Пиксели обрабатываются в float32 и int32
+        cy = cy[spans]
+        span_first = first[spans].astype(np.int32)
+        span_count = last[spans].astype(np.int32) - span_first + 1
+        depth_slope = np.repeat(depth_plane[0], rows)[spans].astype(np.float32)
+        depth_offset = (np.repeat(depth_plane[1], rows)[spans] * cy +
+                        np.repeat(depth_plane[2], rows)[spans]).astype(np.float32)
+        if gouraud:
+            span_colors = (np.repeat(color_plane[0], rows, axis=0)[spans],
+                           np.repeat(color_plane[1], rows, axis=0)[spans] * cy[:, None] +
+                           np.repeat(color_plane[2], rows, axis=0)[spans])
+        else:
+            span_colors = (np.repeat(colors[index], rows)[spans],)
+        span_y = (cy - 0.5).astype(np.int32)
+
+        # Строки делятся на порции с ограниченным числом пикселей
+        ends = np.cumsum(span_count)
+        parts = np.searchsorted(ends, np.arange(RASTER_FRAGMENTS, ends[-1] if len(ends) else 0,
+                                                RASTER_FRAGMENTS), side='right')
+        for start, stop in zip(np.concatenate(([0], parts)), np.concatenate((parts, [len(ends)]))):
+            if start < stop:
+                part = slice(start, stop)
+                self.draw_spans(span_y[part], span_first[part], span_count[part],
+                                depth_slope[part], depth_offset[part],
+                                tuple(v[part] for v in span_colors))
+        return len(index)
+
+    def draw_spans(self, rows, first, count, depth_slope, depth_offset, colors):
+        # colors - пиксели строк или наклон и смещение цвета вдоль строки
+        width = self.depth.shape[1]
+        px = np.arange(count.sum(), dtype=np.int32) + \
+             np.repeat(first - (np.cumsum(count, dtype=np.int32) - count), count)
+        cx = px.astype(np.float32) + np.float32(0.5)
+        pixel = px + np.repeat(rows * width, count)
+        depth = np.repeat(depth_slope, count) * cx + np.repeat(depth_offset, count)
+
+        # Тест глубины: цвет записывают фрагменты с ближайшей глубиной
+        depth_buffer = self.depth.reshape(-1)
+        near = np.flatnonzero((depth >= -1) & (depth < depth_buffer[pixel]))
+        depth = depth[near]
+        np.minimum.at(depth_buffer, pixel[near], depth)
+        won = near[depth == depth_buffer[pixel[near]]]
+
+        if len(colors) == 2:
+            slope, offset = colors
+            span = np.repeat(np.arange(len(count)), count)[won]
+            color = pack_colors(slope[span] * cx[won, None] + offset[span])
+        else:
+            color = np.repeat(colors[0], count)[won]
+        self.pixels.reshape(-1)[pixel[won]] = color
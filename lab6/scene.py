@@ -0,0 +1,162 @@
+import numpy as np
+
+from perf import perf
+
+def translation_matrices(offsets):
+    # Матрицы переноса (K, 4, 4) для смещений (K, 3)
+    offsets = np.asarray(offsets, dtype=np.float64).reshape(-1, 3)
+    matrices = np.tile(np.eye(4), (len(offsets), 1, 1))
+    matrices[:, :3, 3] = offsets
+    return matrices
+
+def rotation_y_matrices(degrees):
+    # Матрицы поворота (K, 4, 4) вокруг оси Y на углы degrees (K,)
+    angles = np.radians(np.asarray(degrees, dtype=np.float64).reshape(-1))
+    c, s = np.cos(angles), np.sin(angles)
+    matrices = np.tile(np.eye(4), (len(angles), 1, 1))
+    matrices[:, 0, 0], matrices[:, 0, 2] = c, s
+    matrices[:, 2, 0], matrices[:, 2, 2] = -s, c
+    return matrices
+
+def transform_instances(vertices, matrices):
+    # Вершины (N, 4) всех K экземпляров сетки одним пакетным умножением
+    # на стопку матриц (K, 4, 4); результат (K * N, 4), вершины экземпляра k
+    # занимают строки k * N .. (k + 1) * N - 1
+    return np.matmul(vertices, matrices.transpose(0, 2, 1)).reshape(-1, 4)
+
+def instance_indices(indices, count, size):
+    # Номера вершин примитивов (M, c) сетки из size вершин в нумерации
+    # вершин всех count экземпляров: (count * M, c)
+    if count == 1:
+        return indices
+    offsets = np.arange(count, dtype=np.int64)[:, None, None] * size
+    return (indices[None] + offsets).reshape(-1, indices.shape[1])
+
+def instance_primitives(indices, index, size):
+    # Номера вершин примитивов index (в нумерации всех экземпляров,
+    # примитив index принадлежит экземпляру index // len(indices))
+    # для сетки из size вершин. index упорядочен по возрастанию
+    if len(index) and index[-1] == len(index) - 1 and len(index) % len(indices) == 0:
+        # Выбраны все примитивы: выборка по номерам не нужна
+        return instance_indices(indices, len(index) // len(indices), size)
+    instance, local = np.divmod(index, len(indices))
+    return indices[local] + (instance * size)[:, None]
+
+def instance_normals(normals, matrices, index):
+    # Нормали элементов index (в нумерации всех экземпляров) после
+    # поворота матрицами нормалей экземпляров (K, 3, 3). Нормали
+    # поворачиваются все сразу пакетным умножением: это быстрее,
+    # чем умножение отдельной матрицы 3x3 для каждого элемента
+    return np.matmul(normals, matrices.transpose(0, 2, 1)).reshape(-1, 3)[index]
+
+class SceneGraph:
+    # Граф сцены в массивах: родитель parent[i] (-1 у корня), локальная
+    # матрица local[i] и сетка mesh[i] (-1 у группы); мировые матрицы кэшируются
+    def __init__(self):
+        self.meshes = []
+        self.parent = np.empty(0, dtype=np.int64)
+        self.mesh = np.empty(0, dtype=np.int64)
+        self.depth = np.empty(0, dtype=np.int64)
+        self.local = np.empty((0, 4, 4))
+        self.world = np.empty((0, 4, 4))
+        self.dirty = np.empty(0, dtype=bool)
+
+        self.levels = None  # Номера узлов по уровням глубины
+        self.mesh_nodes = None  # Номера узлов-экземпляров каждой сетки
+        self.version = 0  # Число пересчётов мировых матриц
+
+    def add_mesh(self, mesh):
+        self.meshes.append(mesh)
+        self.mesh_nodes = None
+        return len(self.meshes) - 1
+
+    def add_nodes(self, parents, matrices, mesh=-1):
+        # Добавление узлов с родителями parents (K,) и локальными матрицами
+        # (K, 4, 4) или одной общей (4, 4); возвращает номера новых узлов
+        parents = np.asarray(parents, dtype=np.int64).reshape(-1)
+        start = len(self.parent)
+        if len(parents) and (parents.min() < -1 or parents.max() >= start):
+            raise ValueError("родитель узла должен быть добавлен раньше узла")
+        if not -1 <= mesh < len(self.meshes):
+            raise ValueError("сетка узла не добавлена в сцену")
+        matrices = np.broadcast_to(np.asarray(matrices, dtype=np.float64), (len(parents), 4, 4))
+        depth = np.zeros(len(parents), dtype=np.int64)
+        inner = parents >= 0
+        depth[inner] = self.depth[parents[inner]] + 1
+
+        self.parent = np.concatenate((self.parent, parents))
+        self.mesh = np.concatenate((self.mesh, np.full(len(parents), mesh, dtype=np.int64)))
+        self.depth = np.concatenate((self.depth, depth))
+        self.local = np.concatenate((self.local, matrices))
+        self.world = np.concatenate((self.world, matrices))
+        self.dirty = np.concatenate((self.dirty, np.ones(len(parents), dtype=bool)))
+        self.levels = None
+        self.mesh_nodes = None
+        return np.arange(start, start + len(parents))
+
+    def add_node(self, parent=-1, matrix=None, mesh=-1):
+        if matrix is None:
+            matrix = np.eye(4)
+        return int(self.add_nodes([parent], matrix, mesh)[0])
+
+    def set_local(self, nodes, matrices):
+        self.local[nodes] = matrices
+        self.dirty[nodes] = True
+
+    def world_matrices(self):
+        if self.dirty.any():
+            with perf.measure("update_world_matrices"):
+                self.update_world()
+        return self.world
+
+    def update_world(self):
+        if self.levels is None:
+            order = np.argsort(self.depth, kind='stable')
+            self.levels = np.split(order, np.cumsum(np.bincount(self.depth))[:-1])
+        # Узел устарел, если отмечен он сам или устарел его родитель;
+        # уровни обходятся от корней, поэтому родитель уже обработан
+        stale = self.dirty.copy()
+        for level, nodes in enumerate(self.levels):
+            if level == 0:
+                nodes = nodes[stale[nodes]]
+                self.world[nodes] = self.local[nodes]
+                continue
+            parents = self.parent[nodes]
+            stale[nodes] |= stale[parents]
+            update = stale[nodes]
+            nodes, parents = nodes[update], parents[update]
+            if len(nodes):
+                self.world[nodes] = self.world[parents] @ self.local[nodes]
+        self.dirty[:] = False
+        self.version += 1
+
+    def instances(self):
+        # Пары (сетка, мировые матрицы её экземпляров (K, 4, 4))
+        world = self.world_matrices()
+        if self.mesh_nodes is None:
+            self.mesh_nodes = [np.flatnonzero(self.mesh == i) for i in range(len(self.meshes))]
+        return [(mesh, world[nodes]) for mesh, nodes in zip(self.meshes, self.mesh_nodes) if len(nodes)]
+
+def grid_scene(mesh, count, spacing):
+    # Сцена из count экземпляров сетки, расставленных квадратной решёткой
+    # в плоскости XZ с шагом spacing. Корень уменьшает решётку до размера
+    # одного экземпляра, строки решётки - группы, экземпляры повёрнуты
+    # вокруг оси Y на разные углы. При count = 1 все матрицы единичные
+    scene = SceneGraph()
+    index = scene.add_mesh(mesh)
+    side = int(np.ceil(np.sqrt(count)))
+    rows = -(-count // side)
+    root_matrix = np.diag([1 / side, 1 / side, 1 / side, 1.0])
+    root = scene.add_node(matrix=root_matrix)
+
+    row_z = (np.arange(rows) - (rows - 1) / 2) * spacing
+    row_nodes = scene.add_nodes(np.full(rows, root), translation_matrices(
+        np.column_stack((np.zeros(rows), np.zeros(rows), row_z))))
+
+    row, column = np.divmod(np.arange(count), side)
+    column_x = (column - (side - 1) / 2) * spacing
+    # Золотой угол: соседние экземпляры заметно отличаются поворотом
+    local = translation_matrices(np.column_stack((column_x, np.zeros(count), np.zeros(count)))) @ \
+            rotation_y_matrices(np.arange(count) * 137.5)
+    scene.add_nodes(row_nodes[row], local, index)
+    return scene
@@ -0,0 +1,156 @@
+import math
+import time
+from collections import deque
+
+import numpy as np
+from PySide6.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from perf import perf
+from scene import transform_instances
+
+FRAME_INTERVAL = 1 / 60  # Желаемый интервал между кадрами анимации, с
+ROTATION_SPEED = 1000 / 30  # Скорость автоповорота, градусов в секунду (1° за 30 мс)
+FPS_WINDOW = 1.0  # Интервал, по которому считается частота кадров, с
+
+class PreparedFrame:
+    # Вершины экземпляров сцены в пространстве отсечения для кадра на момент moment
+    def __init__(self, scene, matrix, moment):
+        self.scene = scene
+        self.moment = moment
+        self.sources = scene.instances()
+        self.version = scene.version
+        self.vertices = [mesh.vertices for mesh in scene.meshes]
+        self.matrix = matrix
+        self.instances = None
+
+    def project(self):
+        self.instances = [(mesh, world, self.matrix @ world,
+                           transform_instances(mesh.vertices, self.matrix @ world))
+                          for mesh, world in self.sources]
+
+    def matches(self, scene, matrix):
+        if scene is not self.scene or self.instances is None:
+            return False
+        scene.world_matrices()
+        return (scene.version == self.version and
+                all(mesh.vertices is vertices for mesh, vertices in zip(scene.meshes, self.vertices)) and
+                np.array_equal(matrix, self.matrix))
+
+class PrepareSignals(QObject):
+    finished = Signal(object)  # подготовленный кадр PreparedFrame
+
+class PrepareWorker(QRunnable):
+    # Подготовка вершин следующего кадра в потоке пула во время отрисовки текущего
+    def __init__(self, frame):
+        super().__init__()
+        self.frame = frame
+        self.signals = PrepareSignals()
+
+    def run(self):
+        with perf.measure("prepare_frame"):
+            self.frame.project()
+        self.signals.finished.emit(self.frame)
+
+class FrameScheduler:
+    # Кадры автоповорота: угол зависит от времени кадра, а не от числа срабатываний таймера
+    def __init__(self, widget, interval=FRAME_INTERVAL, speed=ROTATION_SPEED):
+        self.widget = widget
+        self.interval = interval
+        self.speed = speed
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+        self.running = False
+        self.pending = False  # Кадр запрошен, но ещё не нарисован
+        self.worker = None  # Задача пула, готовящая следующий кадр
+        self.base_angle = 0.0  # Угол в момент base_time
+        self.base_time = 0.0
+        self.last_angle = None  # Последний угол, заданный планировщиком
+        self.next_time = 0.0  # Момент, на который запланирован следующий кадр
+        self.paint_start = 0.0
+        self.paint_duration = 0.0  # Длительность отрисовки последнего кадра
+
+        self.frame_times = deque()
+        self.fps = 0.0  # Частота нарисованных кадров за последние FPS_WINDOW секунд
+        self.dropped = 0  # Число пропущенных кадров с момента запуска
+
+    def start(self):
+        now = time.perf_counter()
+        self.base_angle, self.base_time = self.widget.transform.rotation[1], now
+        self.last_angle = None
+        self.next_time = now
+        self.frame_times.clear()
+        self.fps = 0.0
+        self.dropped = 0
+        self.running = True
+        self.timer.start(max(1, round(self.interval * 1000)))
+        self.tick()
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def angle_at(self, moment):
+        return round((self.base_angle + self.speed * (moment - self.base_time)) % 360, 1)
+
+    def tick(self):
+        if not self.running or self.pending:
+            return
+        now = time.perf_counter()
+        # Угол, изменённый слайдером, становится новой точкой отсчёта
+        rotation = self.widget.transform.rotation[1]
+        if self.last_angle is not None and rotation != self.last_angle:
+            self.base_angle, self.base_time = rotation, now
+        moment = self.next_time
+        late = now - moment
+        if late >= self.interval:
+            moment += int(late / self.interval) * self.interval
+        # Подготовленный кадр показывается в свой момент
+        frame = self.widget.prepared
+        if frame is not None and frame.instances is not None and \
+                abs(frame.moment - moment) <= self.interval:
+            moment = frame.moment
+        self.dropped += max(round((moment - self.next_time) / self.interval), 0)
+
+        self.last_angle = self.angle_at(moment)
+        self.widget.transform.set_rotation(1, self.last_angle)
+        self.pending = True
+        self.widget.update()
+        self.next_time = moment + self.interval
+
+    def frame_started(self):
+        # Начало отрисовки кадра: запуск подготовки следующего
+        widget = self.widget
+        self.paint_start = time.perf_counter()
+        if not self.running or self.worker is not None or widget.show_projections:
+            return
+        # Долгая отрисовка сдвигает следующий кадр
+        moment = self.next_time
+        finish = self.paint_start + self.paint_duration
+        if self.paint_duration > self.interval and finish > moment:
+            moment += math.ceil((finish - moment) / self.interval) * self.interval
+        state = widget.transform.copy()
+        state.set_rotation(1, self.angle_at(moment))
+        frame = PreparedFrame(widget.scene, state.mvp_matrix(widget.projection_matrix), moment)
+        worker = PrepareWorker(frame)
+        worker.signals.finished.connect(self.prepared)
+        self.worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def prepared(self, frame):
+        self.worker = None
+        if self.running:
+            self.widget.prepared = frame
+
+    def frame_painted(self):
+        self.pending = False
+        now = time.perf_counter()
+        self.paint_duration = now - self.paint_start
+        if not self.running:
+            return
+        self.frame_times.append(now)
+        while now - self.frame_times[0] > FPS_WINDOW:
+            self.frame_times.popleft()
+        if len(self.frame_times) > 1:
+            self.fps = (len(self.frame_times) - 1) / (self.frame_times[-1] - self.frame_times[0])
@@ -0,0 +1,62 @@
+import numpy as np
+
+from bvh import BVH, primitive_bounds, ray_triangles
+from frustum import FRUSTUM_PLANES, plane_distances, outcodes, inside_frustum
+from scene import translation_matrices, transform_instances
+from viewports import perspective, look_at
+
+def triangle_soup(count, seed=0):
+    # Мелкие треугольники, разбросанные в кубе [-2, 2]^3
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-2, 2, (count, 1, 3))
+    points = (centers + rng.uniform(-0.1, 0.1, (count, 3, 3))).reshape(-1, 3)
+    triangles = np.arange(len(points), dtype=np.int32).reshape(-1, 3)
+    return points, triangles
+
+def instance_matrices():
+    # Четыре экземпляра, часть которых выходит за пирамиду видимости
+    view = perspective(45, 4 / 3, 0.1, 100.0) @ look_at((0, 0, 8), (0, 0, 0))
+    return view @ translation_matrices([[0, 0, 0], [3, 0, 0], [-2, 2, 1], [0, 0, 12]])
+
+def test_cull_keeps_every_visible_primitive():
+    points, triangles = triangle_soup(3000)
+    bvh = BVH(*primitive_bounds(points, triangles))
+    matrices = instance_matrices()
+    found = bvh.cull(np.matmul(FRUSTUM_PLANES, matrices))
+
+    vertices = np.column_stack((points, np.ones(len(points))))
+    clip = transform_instances(vertices, matrices)
+    offsets = (np.arange(len(matrices)) * len(points))[:, None, None]
+    codes = outcodes(plane_distances(clip))
+    expected = np.flatnonzero(inside_frustum(codes, (triangles[None] + offsets).reshape(-1, 3)))
+
+    assert np.all(np.diff(found) > 0)
+    assert np.isin(expected, found).all()
+    # Иерархия отбрасывает экземпляр позади камеры и невидимые части остальных
+    assert len(found) < len(matrices) * len(triangles) * 0.75
+
+def test_ray_candidates_give_nearest_hit():
+    points, triangles = triangle_soup(3000, seed=1)
+    bvh = BVH(*primitive_bounds(points, triangles))
+    a, b, c = (points[triangles[:, k]] for k in range(3))
+
+    rng = np.random.default_rng(2)
+    # Лучи через центры случайных треугольников и случайные лучи
+    targets = np.concatenate(((a + b + c)[rng.integers(0, len(triangles), 150)] / 3,
+                              rng.uniform(-2, 2, (50, 3))))
+    origins = rng.uniform(-5, 5, (len(targets), 3))
+    directions = (targets - origins) * 3
+
+    ray, triangle = np.divmod(bvh.ray_candidates(origins, directions), len(triangles))
+    t = ray_triangles(origins[ray], directions[ray], a[triangle], b[triangle], c[triangle])
+    t[(t < 0) | (t > 1)] = np.inf
+    nearest = np.full(len(origins), np.inf)
+    np.minimum.at(nearest, ray, t)
+    assert np.isfinite(nearest[:150]).all()
+
+    for k in range(len(origins)):
+        count = len(triangles)
+        t = ray_triangles(np.repeat(origins[k:k + 1], count, axis=0),
+                          np.repeat(directions[k:k + 1], count, axis=0), a, b, c)
+        t[(t < 0) | (t > 1)] = np.inf
+        assert nearest[k] == t.min()
@@ -0,0 +1,33 @@
+import pytest
+
+from mesh_io import load_mesh
+
+@pytest.mark.parametrize("header", [
+    "format ascii 1.0\nelement vertex 1\nproperty half x\n",
+    "format ascii 1.0\nelement vertex 1\nproperty float\n",
+    "format ascii 1.0\nelement vertex 1\nproperty list uchar x\n",
+    "format ascii 1.0\nproperty float x\nelement vertex 1\n",
+    "format ascii 1.0\nelement vertex\n",
+    "format\n",
+])
+def test_broken_header_raises_value_error(tmp_path, header):
+    # Интерфейс перехватывает только OSError и ValueError, поэтому ошибки
+    # в заголовке не должны приводить к KeyError или IndexError
+    filename = tmp_path / "mesh.ply"
+    filename.write_text("ply\n" + header + "end_header\n0 0 0\n")
+    with pytest.raises(ValueError):
+        load_mesh(str(filename), cache=False)
+
+@pytest.mark.parametrize("body", [
+    "0 0 0\n1 0 0\n0 1 0\n3 0 1\n",
+    "0 0 0\n1 0 0\n0 1 0\n",
+    "0 0 0\n1 0 0\n0 1\n3 0 1 2\n",
+])
+def test_broken_body_raises_value_error(tmp_path, body):
+    # Грань короче своего счётчика, недостающая грань и неполная вершина
+    filename = tmp_path / "mesh.ply"
+    filename.write_text("ply\nformat ascii 1.0\nelement vertex 3\nproperty float x\n"
+                        "property float y\nproperty float z\nelement face 1\n"
+                        "property list uchar int vertex_indices\nend_header\n" + body)
+    with pytest.raises(ValueError):
+        load_mesh(str(filename), cache=False)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from rasterizer import Rasterizer, pack_colors
+
+WIDTH, HEIGHT = 64, 48
+
+def reference_image(clip, triangles, colors):
+    # Перебор всех пикселей и треугольников: пиксель закрашивается, если
+    # его центр внутри треугольника (все барицентрические координаты
+    # неотрицательны), из нескольких треугольников выбирается ближайший
+    x = (clip[:, 0] / clip[:, 3] + 1) * WIDTH / 2
+    y = (1 - clip[:, 1] / clip[:, 3]) * HEIGHT / 2
+    z = clip[:, 2] / clip[:, 3]
+    cx, cy = np.meshgrid(np.arange(WIDTH) + 0.5, np.arange(HEIGHT) + 0.5)
+    pixels = np.zeros((HEIGHT, WIDTH), dtype=np.uint32)
+    depth = np.full((HEIGHT, WIDTH), np.inf)
+    for (i0, i1, i2), color in zip(triangles, colors):
+        denom = (y[i1] - y[i2]) * (x[i0] - x[i2]) + (x[i2] - x[i1]) * (y[i0] - y[i2])
+        if denom == 0:
+            continue
+        l0 = ((y[i1] - y[i2]) * (cx - x[i2]) + (x[i2] - x[i1]) * (cy - y[i2])) / denom
+        l1 = ((y[i2] - y[i0]) * (cx - x[i2]) + (x[i0] - x[i2]) * (cy - y[i2])) / denom
+        l2 = 1 - l0 - l1
+        d = l0 * z[i0] + l1 * z[i1] + l2 * z[i2]
+        covered = (l0 >= 0) & (l1 >= 0) & (l2 >= 0) & (d >= -1) & (d < depth)
+        depth[covered] = d[covered]
+        pixels[covered] = color
+    return pixels
+
+def test_flat_fill_matches_reference():
+    rng = np.random.default_rng(0)
+    count = 40
+    clip = np.column_stack((rng.uniform(-1.2, 1.2, (3 * count, 2)),
+                            np.repeat(rng.uniform(-0.9, 0.9, count), 3) +
+                            rng.uniform(-0.05, 0.05, 3 * count),
+                            np.ones(3 * count)))
+    triangles = np.arange(3 * count, dtype=np.int32).reshape(-1, 3)
+    colors = pack_colors(rng.uniform(0, 255, (count, 3)))
+
+    rasterizer = Rasterizer()
+    rasterizer.resize(WIDTH, HEIGHT)
+    rasterizer.clear()
+    assert rasterizer.draw_triangles(clip, triangles, colors) > 0
+    expected = reference_image(clip, triangles, colors)
+    np.testing.assert_array_equal(rasterizer.pixels, expected)
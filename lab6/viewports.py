@@ -0,0 +1,99 @@
+import math
+import numpy as np
+
+from perf import perf
+from frustum import clip_edges
+
+ORTHO_EXTENT = 3.5  # Половина стороны области, видимой в ортографическом виде
+VIEW_EYE = (6.0, 5.0, 9.0)  # Положение камеры перспективного вида в четвёртой области
+VIEW_TARGET = (0.0, 1.0, 0.0)  # Точка, на которую смотрит эта камера
+
+def perspective(fov, aspect, near, far):
+    # Матрица перспективной проекции с углом обзора fov (в градусах)
+    f = 1.0 / math.tan(math.radians(fov) / 2)
+    return np.array([
+        [f/aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far+near)/(near-far), (2*far*near)/(near-far)],
+        [0, 0, -1, 0]
+    ])
+
+def look_at(eye, target, up=(0.0, 1.0, 0.0)):
+    # Матрица вида: камера в точке eye смотрит на target, ось -Z камеры
+    # направлена на target, ось Y - вверх
+    eye, target, up = (np.asarray(v, dtype=np.float64) for v in (eye, target, up))
+    forward = target - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    right /= np.linalg.norm(right)
+    view = np.eye(4)
+    view[0, :3] = right
+    view[1, :3] = np.cross(right, forward)
+    view[2, :3] = -forward
+    view[:3, 3] = -view[:3, :3] @ eye
+    return view
+
+class OrthographicCamera:
+    # Вид вдоль координатной оси: экранные x и y - столбцы axes мировых
+    # координат. Проекция сводится к выбору двух столбцов и аффинному
+    # отображению квадрата [-extent, extent]^2 на область вида
+    def __init__(self, axes, extent=ORTHO_EXTENT):
+        self.axes = axes
+        self.extent = extent
+
+    @perf.timed("project_orthographic")
+    def project(self, points, edges, rect):
+        # Отрезки рёбер (E, 4) в пикселях для вершин points (N, 4)
+        # в мировых координатах и области rect = (x, y, ширина, высота)
+        left, top, width, height = rect
+        a, b = self.axes
+        x = left + (points[:, a] / self.extent + 1) * width / 2
+        y = top + (1 - points[:, b] / self.extent) * height / 2
+        return np.column_stack((x, y))[edges].reshape(-1, 4)
+
+class PerspectiveCamera:
+    # Камера с собственным положением и перспективной проекцией;
+    # матрица P @ V кэшируется для соотношения сторон области
+    def __init__(self, eye, target, up=(0.0, 1.0, 0.0), fov=45, near=0.1, far=100.0):
+        self.view = look_at(eye, target, up)
+        self.fov, self.near, self.far = fov, near, far
+        self.aspect = None
+        self.matrix = None
+
+    @perf.timed("project_perspective_view")
+    def project(self, points, edges, rect):
+        # Рёбра отсекаются пирамидой видимости камеры до деления на w
+        left, top, width, height = rect
+        aspect = width / max(height, 1)
+        if self.aspect != aspect:
+            self.matrix = perspective(self.fov, aspect, self.near, self.far) @ self.view
+            self.aspect = aspect
+        segments = clip_edges(points @ self.matrix.T, edges).reshape(-1, 4)
+        x = left + (segments[:, 0] / segments[:, 3] + 1) * width / 2
+        y = top + (1 - segments[:, 1] / segments[:, 3]) * height / 2
+        return np.column_stack((x, y)).reshape(-1, 4)
+
+class Viewport:
+    # Область виджета со своей камерой; rect задаётся долями ширины
+    # и высоты виджета: (x, y, ширина, высота)
+    def __init__(self, name, rect, camera):
+        self.name = name
+        self.rect = rect
+        self.camera = camera
+
+    def pixel_rect(self, width, height):
+        x, y, w, h = self.rect
+        return (x * width, y * height, w * width, h * height)
+
+def default_viewports(perspective_view=False):
+    # Три ортографические проекции в четвертях виджета и, по желанию,
+    # перспективный вид в свободной четверти
+    viewports = [
+        Viewport("XY Plane", (0.0, 0.0, 0.5, 0.5), OrthographicCamera((0, 1))),
+        Viewport("XZ Plane", (0.5, 0.0, 0.5, 0.5), OrthographicCamera((0, 2))),
+        Viewport("YZ Plane", (0.0, 0.5, 0.5, 0.5), OrthographicCamera((1, 2))),
+    ]
+    if perspective_view:
+        viewports.append(Viewport("Perspective", (0.5, 0.5, 0.5, 0.5),
+                                  PerspectiveCamera(VIEW_EYE, VIEW_TARGET)))
+    return viewports